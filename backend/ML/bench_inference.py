@@ -0,0 +1,65 @@
+"""
+Suraksha-Net Inference Microbenchmark
+=====================================
+Compares sklearn's RandomForest.predict_proba against the flattened NumPy
+evaluator (app/services/forest.py) and the precomputed risk lookup table
+(app/services/risk_table.py), after checking they agree.
+
+Usage (from backend/):  python ML/bench_inference.py
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.forest import FlatForest  # noqa: E402
+from app.services.model_registry import registry  # noqa: E402
+from app.services.risk_table import feature_row, get_risk_table  # noqa: E402
+
+bundle = registry.get()
+if bundle is None:
+    raise SystemExit("Model artifacts not found. Run train.py first.")
+
+model = bundle.model
+flat = FlatForest.from_sklearn(model)
+table = get_risk_table()
+
+# ── 1. Parity on every (weather, road, hour) combination ─────────────────────
+weathers = [*table.weathers, "Unknown"]
+roads = [*table.road_conditions, "Unknown"]
+keys = [(w, r, h) for w in weathers for r in roads for h in range(24)]
+X = np.array([feature_row(bundle.encoders, w, r, h) for w, r, h in keys])
+
+sk = model.predict_proba(X)
+fl = flat.predict_proba(X)
+tb = table.lookup_batch(*zip(*keys))
+print(f"[OK] {len(keys)} inputs | max |flat - sklearn| = {np.abs(fl - sk).max():.2e}")
+print(f"[OK] {len(keys)} inputs | max |table - sklearn| = {np.abs(tb - sk).max():.2e}")
+assert np.allclose(fl, sk, atol=1e-9) and np.allclose(tb, sk, atol=1e-9)
+
+
+# ── 2. Timings ───────────────────────────────────────────────────────────────
+def bench(label, fn, number):
+    per_call = timeit.timeit(fn, number=number) / number
+    print(f"   {label:34s} {per_call * 1e3:9.3f} ms")
+    return per_call
+
+
+row = X[:1]
+batch = X[np.random.default_rng(0).integers(0, len(X), 60)]
+
+print("\n--- Single row ---")
+t_sk = bench("sklearn predict_proba", lambda: model.predict_proba(row), 50)
+t_fl = bench("FlatForest.predict_proba", lambda: flat.predict_proba(row), 2000)
+t_tb = bench("RiskTable.lookup", lambda: table.lookup("Rainy", "Wet", 18), 20000)
+
+print("\n--- Batch of 60 (one /navigate-safe request) ---")
+bench("sklearn predict_proba", lambda: model.predict_proba(batch), 50)
+bench("FlatForest.predict_proba", lambda: flat.predict_proba(batch), 500)
+
+print(f"\n[DONE] FlatForest single-row speedup: {t_sk / t_fl:.0f}x")
+print(f"[DONE] RiskTable single-row speedup:  {t_sk / t_tb:.0f}x")
@@ -167,4 +167,4 @@ print("   - severity_encoder.pkl  (Low/Medium/High target encoder)")
 print("   - coord_scaler.pkl      (Lat/Lng StandardScaler)")
 print("   - kmeans_hotspots.pkl   (KMeans hotspot cluster model)")
 print("   - feature_config.pkl    (Feature names + risk lookup maps)")
-print("\n[DONE] Restart uvicorn to load new models.")
\ No newline at end of file
+print("\n[DONE] Running servers hot-reload the new models within a few seconds.")
\ No newline at end of file
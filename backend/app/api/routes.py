@@ -1,148 +1,42 @@
 import os
 import asyncio
-import joblib
+import json
 import numpy as np
 from typing import Optional
 from datetime import datetime
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from app.services.accidents import nearest_hotspot
+from app.services.metrics import metrics
+from app.services.model_registry import registry
 from app.services.navigation import get_safer_route
-from app.services.chatbot import chat as groq_chat
+from app.services.chatbot import chat as groq_chat, chat_stream
+from app.services.risk_table import (
+    feature_matrix,
+    risk_proba,
+    severity_classes,
+)
+from app.services.sos_store import (
+    STATUSES,
+    parse_id as parse_sos_id,
+    store as sos_store,
+)
 from app.services.weather import get_weather
 from app.services.websocket import manager as ws_manager, build_alert
 
 router = APIRouter()
 
-# --------------------------------------------------
-# 1. Load ML Artifacts
-# --------------------------------------------------
-MODEL = None
-ENCODERS = None
-SCALER = None
-KMEANS = None
-SEVERITY_LE = None
-FEATURE_CONFIG = None
-
-_MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "models")
-
-try:
-    MODEL = joblib.load(os.path.join(_MODEL_DIR, "severity_model.pkl"))
-    ENCODERS = joblib.load(os.path.join(_MODEL_DIR, "encoders.pkl"))
-    SCALER = joblib.load(os.path.join(_MODEL_DIR, "coord_scaler.pkl"))
-    KMEANS = joblib.load(os.path.join(_MODEL_DIR, "kmeans_hotspots.pkl"))
-    SEVERITY_LE = joblib.load(os.path.join(_MODEL_DIR, "severity_encoder.pkl"))
-    try:
-        FEATURE_CONFIG = joblib.load(os.path.join(_MODEL_DIR, "feature_config.pkl"))
-    except Exception:
-        FEATURE_CONFIG = None
-    print("[OK] ML models loaded successfully.")
-except Exception as e:
-    print(f"[WARN] ML model files not found. Run train.py first. Error: {e}")
-
-
-# --------------------------------------------------
-# Inference helper: build 15-feature vector
-# --------------------------------------------------
-_ROAD_RISK = {
-    "Slippery": 4,
-    "Potholed": 3,
-    "Under Construction": 3,
-    "Wet": 2,
-    "Dry": 1,
-    "Good": 1,
-}
-_TIME_RISK = {
-    "Late Night": 3,
-    "Night": 2,
-    "Morning Rush": 2,
-    "Evening Rush": 2,
-    "Afternoon": 1,
-    "Midday": 1,
-}
-_WEATHER_SEVERITY = {
-    "Clear": 1,
-    "Cloudy": 1,
-    "Rainy": 3,
-    "Foggy": 2,
-    "Stormy": 4,
-    "Hail": 4,
-    "Snowy": 3,
-}
-
-
-def _safe_encode(encoder_key: str, value: str) -> int:
-    try:
-        return int(ENCODERS[encoder_key].transform([value])[0])
-    except (ValueError, KeyError):
-        return 0
-
-
-def _get_time_bin(hour: int) -> str:
-    if 6 <= hour < 10:
-        return "Morning Rush"
-    if 10 <= hour < 12:
-        return "Midday"
-    if 12 <= hour < 16:
-        return "Afternoon"
-    if 16 <= hour < 20:
-        return "Evening Rush"
-    if 20 <= hour < 23:
-        return "Night"
-    return "Late Night"
-
-
-def _get_day_night(hour: int) -> str:
-    return "Nighttime" if hour >= 20 or hour < 6 else "Daytime"
-
-
-def build_feature_vector(
-    weather: str = "Clear",
-    road_condition: str = "Dry",
-    hour: int = 12,
-) -> np.ndarray:
-    time_bin = _get_time_bin(hour)
-    day_night = _get_day_night(hour)
-
-    weather_enc = _safe_encode("Weather", weather)
-    road_condition_enc = _safe_encode("Road_Condition", road_condition)
-    time_bin_enc = _safe_encode("Time_Bin", time_bin)
-    day_night_enc = _safe_encode("Day_Night", day_night)
-
-    weather_severity = _WEATHER_SEVERITY.get(weather, 2)
-    traffic_density = 5
-    road_risk_num = _ROAD_RISK.get(road_condition, 2)
-    time_risk_num = _TIME_RISK.get(time_bin, 1)
-    is_night = 1 if day_night == "Nighttime" else 0
-    weather_road_risk = weather_severity * road_risk_num
-
-    casualty_severity_idx = 0
-    total_casualties = 0
-    fatalities = 0
-    serious_injuries = 0
-    minor_injuries = 0
-
-    return np.array(
-        [
-            [
-                weather_enc,
-                road_condition_enc,
-                time_bin_enc,
-                day_night_enc,
-                weather_severity,
-                traffic_density,
-                road_risk_num,
-                time_risk_num,
-                is_night,
-                weather_road_risk,
-                casualty_severity_idx,
-                total_casualties,
-                fatalities,
-                serious_injuries,
-                minor_injuries,
-            ]
-        ]
-    )
+# Upper bound on items per /predict-risk/batch call
+PREDICT_BATCH_MAX = int(os.getenv("PREDICT_BATCH_MAX", "20000"))
+# Upper bound on alerts per /admin/alerts page
+ALERTS_PAGE_MAX = int(os.getenv("ALERTS_PAGE_MAX", "500"))
+# Upper bounds for /sos/list pages and /sos/nearby radius
+SOS_PAGE_MAX = int(os.getenv("SOS_PAGE_MAX", "500"))
+SOS_NEARBY_MAX_KM = float(os.getenv("SOS_NEARBY_MAX_KM", "50"))
+# Drivers within this distance of an SOS are alerted
+SOS_ALERT_RADIUS_KM = float(os.getenv("SOS_ALERT_RADIUS_KM", "5"))
 
 
 # --------------------------------------------------
@@ -172,6 +66,10 @@ class SOSRequest(BaseModel):
     driver_name: Optional[str] = "Unknown Driver"
 
 
+class SOSStatusRequest(BaseModel):
+    status: str  # active | acknowledged | resolved
+
+
 class BroadcastRequest(BaseModel):
     zone: str
     message: str
@@ -189,12 +87,6 @@ class RouteSummaryRequest(BaseModel):
     weather: Optional[str] = None
 
 
-# --------------------------------------------------
-# In-memory SOS log
-# --------------------------------------------------
-_sos_events: list[dict] = []
-
-
 # --------------------------------------------------
 # 3. Endpoints
 # --------------------------------------------------
@@ -204,38 +96,37 @@ _sos_events: list[dict] = []
 async def health_check():
     return {
         "status": "healthy",
-        "model_loaded": MODEL is not None,
+        **registry.status(),
         "ws_connections": ws_manager.connected_count,
     }
 
 
+@router.get("/metrics")
+async def metrics_endpoint():
+    """Per-worker counters, upstream latencies, single-flight dedup and cache stats."""
+    return metrics.snapshot()
+
+
 @router.post("/predict-risk")
 async def predict_risk(data: RiskRequest):
     """Predicts accident risk for a single coordinate."""
-    if MODEL is None or ENCODERS is None or SEVERITY_LE is None:
+    now = datetime.now()
+    hour = now.hour
+    weather = data.weather or "Clear"
+    road_condition = data.road_condition or "Dry"
+
+    # Precomputed table lookup (or flattened forest) — no sklearn per request
+    scored = risk_proba([weather], [road_condition], [hour])
+    if scored is None:
         raise HTTPException(
             status_code=503,
             detail="ML models are not loaded. Run train.py first.",
         )
     try:
-        now = datetime.now()
-        hour = now.hour
-
-        features = build_feature_vector(
-            weather=data.weather or "Clear",
-            road_condition=data.road_condition or "Dry",
-            hour=hour,
-        )
-
-        prediction = MODEL.predict(features)[0]
-        label = SEVERITY_LE.inverse_transform([prediction])[0]
-
-        proba = MODEL.predict_proba(features)[0]
-        try:
-            high_idx = list(SEVERITY_LE.classes_).index("High")
-            risk_pct = float(proba[high_idx])
-        except (ValueError, IndexError):
-            risk_pct = 0.5
+        proba, table = scored
+        prediction = int(np.argmax(proba[0]))
+        label = table.classes[prediction]
+        risk_pct = float(table.high_probability(proba[0]))
 
         return {
             "status": "success",
@@ -247,11 +138,64 @@ async def predict_risk(data: RiskRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _score_batch(bundle, items: list[RiskRequest], hour: int) -> list[dict]:
+    X = feature_matrix(
+        bundle.encoders,
+        [item.weather or "Clear" for item in items],
+        [item.road_condition or "Dry" for item in items],
+        np.full(len(items), hour),
+    )
+    # One forest invocation for the whole batch; the label is the argmax
+    proba = bundle.model.predict_proba(X)
+    predictions = proba.argmax(axis=1)
+    table = severity_classes(bundle)
+    labels = np.asarray(table.classes)[predictions]
+    high = np.round(table.high_probability(proba), 4)
+    return [
+        {
+            "risk_level": str(label),
+            "risk_score": int(prediction),
+            "risk_probability": float(p),
+        }
+        for label, prediction, p in zip(labels, predictions, high)
+    ]
+
+
+@router.post("/predict-risk/batch")
+async def predict_risk_batch(items: list[RiskRequest]):
+    """Predicts accident risk for many coordinates; results keep input order."""
+    if len(items) > PREDICT_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {PREDICT_BATCH_MAX} items per batch.",
+        )
+    if not items:
+        return {"status": "success", "count": 0, "results": []}
+    bundle = registry.get()
+    if bundle is None:
+        raise HTTPException(
+            status_code=503,
+            detail="ML models are not loaded. Run train.py first.",
+        )
+    try:
+        results = await asyncio.to_thread(
+            _score_batch, bundle, items, datetime.now().hour
+        )
+        return {"status": "success", "count": len(results), "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/navigate-safe")
 async def navigate_safe(data: NavigationRequest):
     """Calculates and ranks routes by safety score using the Mappls API."""
+    if registry.get() is None:
+        raise HTTPException(
+            status_code=503,
+            detail="ML models are not loaded. Run train.py first.",
+        )
     try:
-        results = get_safer_route(
+        results = await get_safer_route(
             data.origin_lat,
             data.origin_lon,
             data.dest_lat,
@@ -277,12 +221,28 @@ class ChatRequest(BaseModel):
     messages: list[ChatMessage]
 
 
+def _sse(events) -> StreamingResponse:
+    """Server-sent events: ``event: <type>`` / ``data: <json>`` per item."""
+
+    async def body():
+        async for event in events:
+            payload = json.dumps(event, ensure_ascii=False)
+            yield f"event: {event['type']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Don't let proxies buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/chat")
 async def chat_endpoint(data: ChatRequest):
     """AI chatbot powered by Groq."""
     try:
         msgs = [{"role": m.role, "content": m.content} for m in data.messages]
-        result = groq_chat(msgs)
+        result = await groq_chat(msgs)
         return {
             "status": "success",
             "reply": result["reply"],
@@ -292,13 +252,24 @@ async def chat_endpoint(data: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_stream_endpoint(data: ChatRequest):
+    """
+    Streaming chat (SSE): ``token`` events as the reply is generated, a
+    ``route`` event once a route request is recognised, then ``done``
+    with the full reply.
+    """
+    msgs = [{"role": m.role, "content": m.content} for m in data.messages]
+    return _sse(chat_stream(msgs))
+
+
 # --------------------------------------------------
 # Weather
 # --------------------------------------------------
 @router.get("/weather")
 async def weather_endpoint(lat: float, lon: float):
     """Get current weather for a location via OpenWeatherMap."""
-    data = get_weather(lat, lon)
+    data = await get_weather(lat, lon)
     if data is None:
         return {
             "status": "unavailable",
@@ -311,9 +282,7 @@ async def weather_endpoint(lat: float, lon: float):
 # --------------------------------------------------
 # AI Route Summary
 # --------------------------------------------------
-@router.post("/route-summary")
-async def route_summary(data: RouteSummaryRequest):
-    """Generate an AI-powered summary of a route using Groq."""
+def _route_summary_prompt(data: RouteSummaryRequest) -> str:
     hotspots_text = (
         ", ".join(data.top_hotspots[:5]) if data.top_hotspots else "none identified"
     )
@@ -323,7 +292,7 @@ async def route_summary(data: RouteSummaryRequest):
         else "Weather data unavailable"
     )
 
-    prompt = f"""Analyze this route and give a concise 3-4 sentence safety summary:
+    return f"""Analyze this route and give a concise 3-4 sentence safety summary:
 
 Route: {data.start} → {data.end}
 Safety Score: {data.safety_score}/100 ({data.risk_level})
@@ -339,8 +308,13 @@ Provide:
 
 Be concise and actionable. No bullet points — write flowing prose."""
 
+
+@router.post("/route-summary")
+async def route_summary(data: RouteSummaryRequest):
+    """Generate an AI-powered summary of a route using Groq."""
+    prompt = _route_summary_prompt(data)
     try:
-        result = groq_chat([{"role": "user", "content": prompt}])
+        result = await groq_chat([{"role": "user", "content": prompt}])
         return {
             "status": "success",
             "summary": result["reply"],
@@ -352,44 +326,107 @@ Be concise and actionable. No bullet points — write flowing prose."""
         }
 
 
+@router.post("/route-summary/stream")
+async def route_summary_stream(data: RouteSummaryRequest):
+    """Streaming route summary (SSE, same events as ``/chat/stream``)."""
+    prompt = _route_summary_prompt(data)
+    return _sse(chat_stream([{"role": "user", "content": prompt}]))
+
+
 # --------------------------------------------------
 # Emergency SOS
 # --------------------------------------------------
 @router.post("/sos")
 async def emergency_sos(data: SOSRequest):
     """Handle emergency SOS from a driver."""
-    sos_event = {
-        "id": f"SOS-{len(_sos_events) + 1:04d}",
-        "lat": data.lat,
-        "lon": data.lon,
-        "timestamp": data.timestamp or datetime.now().isoformat(),
-        "nearest_hotspot": data.nearest_hotspot,
-        "driver_name": data.driver_name,
-        "status": "active",
-        "created_at": datetime.now().isoformat(),
-    }
-    _sos_events.append(sos_event)
+    # Resolve the nearest hotspot from the dataset; the client's label is
+    # only a fallback when no recorded accident is close by
+    hotspot = nearest_hotspot(data.lat, data.lon)
+    hotspot_name = hotspot["name"] if hotspot else data.nearest_hotspot
+    sos_event = await sos_store.add(
+        data.lat,
+        data.lon,
+        timestamp=data.timestamp,
+        nearest_hotspot=hotspot_name,
+        driver_name=data.driver_name,
+    )
 
-    # Broadcast SOS to all connected drivers
+    # Alert the drivers near the emergency (on every worker)
     alert = build_alert(
         alert_type="sos_nearby",
-        message=f"🆘 Emergency SOS from {data.driver_name} near {data.nearest_hotspot or 'unknown location'}",
+        message=f"🆘 Emergency SOS from {data.driver_name} near {hotspot_name or 'unknown location'}",
         severity="critical",
-        data={"lat": data.lat, "lon": data.lon, "sos_id": sos_event["id"]},
+        data={
+            "lat": data.lat,
+            "lon": data.lon,
+            "sos_id": sos_event["id"],
+            "nearest_hotspot": hotspot,
+            "radius_km": SOS_ALERT_RADIUS_KM,
+        },
+    )
+    notified = await ws_manager.broadcast_near(
+        data.lat, data.lon, SOS_ALERT_RADIUS_KM, alert
     )
-    asyncio.create_task(ws_manager.broadcast(alert))
 
     return {
         "status": "success",
         "sos_id": sos_event["id"],
+        "nearest_hotspot": hotspot_name,
+        "drivers_notified": notified,
         "message": "Emergency SOS sent. Help is on the way.",
     }
 
 
 @router.get("/sos/list")
-async def list_sos():
-    """List all SOS events (for admin dashboard)."""
-    return {"events": _sos_events}
+async def list_sos(
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    """
+    SOS events for the admin dashboard, newest first.
+
+    Filters: ``status``, ``since`` / ``until`` (ISO timestamps). Events
+    come in pages of ``limit`` (default 50, at most ``SOS_PAGE_MAX``);
+    pass the returned ``next_cursor`` as ``cursor`` for the next (older)
+    page. ``next_cursor`` is null on the last page.
+    """
+    before = None
+    if cursor:
+        before = parse_sos_id(cursor)
+        if before is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+    limit = max(1, min(limit, SOS_PAGE_MAX))
+    events = await asyncio.to_thread(
+        sos_store.page, status, since, until, before, limit
+    )
+    return {
+        "events": events,
+        "next_cursor": events[-1]["id"] if len(events) == limit else None,
+    }
+
+
+@router.get("/sos/nearby")
+async def nearby_sos(lat: float, lon: float, radius_km: float = 5.0):
+    """Active SOS events within ``radius_km`` of a point, nearest first."""
+    radius_km = max(0.0, min(radius_km, SOS_NEARBY_MAX_KM))
+    events = await asyncio.to_thread(sos_store.within, lat, lon, radius_km)
+    return {"events": events, "count": len(events)}
+
+
+@router.post("/sos/{sos_id}/status")
+async def update_sos_status(sos_id: str, data: SOSStatusRequest):
+    """Acknowledge or resolve an SOS (admin)."""
+    if data.status not in STATUSES:
+        raise HTTPException(
+            status_code=400, detail=f"status must be one of {', '.join(STATUSES)}"
+        )
+    event = await asyncio.to_thread(sos_store.set_status, sos_id, data.status)
+    if event is None:
+        raise HTTPException(status_code=404, detail="SOS event not found.")
+    return {"status": "success", "event": event}
 
 
 # --------------------------------------------------
@@ -397,26 +434,52 @@ async def list_sos():
 # --------------------------------------------------
 @router.post("/admin/broadcast")
 async def admin_broadcast(data: BroadcastRequest):
-    """Admin sends a zone-specific warning to all drivers."""
+    """Admin sends a warning to the drivers in a zone (or to all drivers)."""
     alert = build_alert(
         alert_type="admin_broadcast",
         message=data.message,
         severity=data.severity,
         zone=data.zone,
     )
-    await ws_manager.broadcast_zone(data.zone, alert)
+    delivered = await ws_manager.broadcast_zone(data.zone, alert)
 
     return {
         "status": "success",
-        "message": "Broadcast sent to all drivers",
+        "message": f"Broadcast sent to {delivered} driver(s)",
+        "delivered": delivered,
         "connected_drivers": ws_manager.connected_count,
     }
 
 
 @router.get("/admin/alerts")
-async def admin_alerts():
-    """Get recent alert log for admin dashboard."""
+async def admin_alerts(
+    cursor: Optional[int] = None,
+    since: Optional[str] = None,
+    limit: int = 20,
+):
+    """
+    Get the alert log for the admin dashboard.
+
+    No parameters: the latest ``limit`` alerts. ``cursor``: only alerts
+    after that ``seq`` (pass back the returned ``cursor`` on each poll).
+    ``since``: only alerts logged after that ISO timestamp (stable across
+    workers, where ``seq`` is per worker). ``missed`` is true when older
+    entries after the cursor already rotated out of the log.
+    """
+    log = ws_manager.alert_log
+    limit = max(1, min(limit, ALERTS_PAGE_MAX))
+    missed = False
+    if cursor is not None:
+        alerts, missed = log.since(cursor, limit)
+    elif since:
+        alerts = log.since_time(since, limit)
+    else:
+        alerts = log.recent(limit)
+    # Next cursor: last alert returned, or "caught up" when nothing was new
+    next_cursor = alerts[-1]["seq"] if alerts else log.last_seq
     return {
-        "alerts": ws_manager.get_recent_alerts(),
+        "alerts": alerts,
+        "cursor": next_cursor,
+        "missed": missed,
         "connected_drivers": ws_manager.connected_count,
     }
@@ -1,14 +1,41 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import pandas as pd
 import numpy as np
-import requests
+import asyncio
+import json
+import time
 import uvicorn
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from app.services import chatbot, http_client
+from app.services.accidents import accident_index, df
+from app.services.geo import nearest_segment
+from app.services.cache import LRUCache, purge_expired_periodically
+from app.services.geocoding import (
+    cached_coords,
+    get_coords,
+    normalize_place,
+    prewarm_reverse,
+    reverse_geocode,
+)
+from app.services.metrics import metrics
+from app.services.pipeline import Stage, StageGraph, StageTimeout
+from app.services.singleflight import SingleFlight
+from app.services.spatial import GridIndex, window_means
+from app.services.weather import (
+    cached_route_weather,
+    cached_weather,
+    get_weather,
+    refresh_hot_cells,
+    route_weather_samples,
+    sample_route_weather,
+    summarize_route_weather,
+)
+
 load_dotenv(Path(__file__).resolve().parent.parent / ".env", override=True)
 
 app = FastAPI(title="Suraksha-Net AI", version="2.0.0")
@@ -43,10 +70,43 @@ from app.api import routes as api_routes  # noqa: E402
 
 app.include_router(api_routes.router, prefix="/api")
 
+from app.services.model_registry import registry as model_registry  # noqa: E402
+
+
+@app.on_event("startup")
+async def prewarm_models():
+    # Load the ML artifacts off the request path; requests that arrive
+    # first simply wait for (or trigger) the same lazy load.
+    if os.getenv("MODEL_PREWARM", "true").lower() != "false":
+        model_registry.prewarm()
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+
+@app.on_event("shutdown")
+async def close_groq_client():
+    await chatbot.aclose()
+
+
 # --------------------------------------------------
 # 3. WebSocket endpoint for real-time alerts
 # --------------------------------------------------
 from app.services.websocket import manager as ws_manager  # noqa: E402
+from app.services import geofence  # noqa: E402,F401 (feeds on WS positions)
+
+
+@app.on_event("startup")
+async def start_alert_pubsub():
+    # Alerts raised on any worker reach the sockets held by every worker
+    await ws_manager.start_pubsub()
+
+
+@app.on_event("shutdown")
+async def stop_alert_pubsub():
+    await ws_manager.stop_pubsub()
 
 
 @app.websocket("/ws/alerts/{session_id}")
@@ -54,35 +114,71 @@ async def websocket_alerts(websocket: WebSocket, session_id: str):
     await ws_manager.connect(session_id, websocket)
     try:
         while True:
-            # Keep connection alive; client can send position updates
-            _data = await websocket.receive_text()
-            # Optionally process position updates for zone detection
+            # Zone subscriptions and position updates (see handle_message)
+            ws_manager.handle_message(session_id, await websocket.receive_text())
     except WebSocketDisconnect:
-        ws_manager.disconnect(session_id)
+        ws_manager.disconnect(session_id, websocket)
 
 
 # --------------------------------------------------
-# 4. Load Dataset (path from .env with sensible default)
+# 4. Dataset (loaded and indexed in app.services.accidents)
 # --------------------------------------------------
-CSV_PATH = os.getenv("ACCIDENTS_CSV_PATH", "final_merged_accidents.csv")
-try:
-    df = pd.read_csv(CSV_PATH)
-    print(f"[OK] Loaded {len(df)} accident records from {CSV_PATH}")
-except FileNotFoundError:
-    print(
-        f"[WARN] Accident CSV not found at '{CSV_PATH}'. "
-        "Route analysis will return empty results. "
-        "Set ACCIDENTS_CSV_PATH in your .env file."
-    )
-    df = pd.DataFrame(
-        columns=[
-            "Latitude",
-            "Longitude",
-            "Risk_Score",
-            "City",
-            "Road_Condition",
-        ]
-    )
+# Pre-resolve place names for the highest-risk locations so most route
+# analyses need no outbound reverse lookups. Rate-limited (Nominatim
+# allows ~1 request/s), run in the background, and in only one worker
+# per host (see prewarm_reverse).
+REVERSE_PREWARM_COUNT = int(os.getenv("REVERSE_PREWARM_COUNT", "300"))
+REVERSE_PREWARM_RATE = float(os.getenv("REVERSE_PREWARM_RATE", "1"))
+_background_tasks: set = set()
+
+
+async def _prewarm_reverse_geocode():
+    top = df.nlargest(REVERSE_PREWARM_COUNT, "Risk_Score")
+    try:
+        looked_up = await prewarm_reverse(
+            top["Latitude"].to_numpy(),
+            top["Longitude"].to_numpy(),
+            rate_per_sec=REVERSE_PREWARM_RATE,
+        )
+        if looked_up is None:
+            print("[OK] Reverse-geocode prewarm running in another worker")
+        else:
+            print(f"[OK] Reverse-geocode cache warmed ({looked_up} new hotspot cells)")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"[WARN] Reverse-geocode prewarm stopped: {e}")
+
+
+@app.on_event("startup")
+async def prewarm_reverse_geocode():
+    # REVERSE_PREWARM_RATE=0 (or REVERSE_PREWARM_COUNT=0) disables it
+    if REVERSE_PREWARM_COUNT > 0 and REVERSE_PREWARM_RATE > 0 and not df.empty:
+        task = asyncio.create_task(_prewarm_reverse_geocode())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+@app.on_event("startup")
+async def start_weather_refresher():
+    # Keeps hot weather cells fresh so cached areas never wait on OWM
+    task = asyncio.create_task(refresh_hot_cells())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@app.on_event("startup")
+async def start_cache_purger():
+    # Expired geocode rows are deleted from disk, not just skipped on read
+    task = asyncio.create_task(purge_expired_periodically())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in list(_background_tasks):
+        task.cancel()
 
 
 # --------------------------------------------------
@@ -94,107 +190,33 @@ class RouteRequest(BaseModel):
 
 
 # --------------------------------------------------
-# 6. Helper: geocode a place name via Nominatim
+# 6. Helpers: forward / reverse geocoding (cached)
 # --------------------------------------------------
-def get_coords(location_name: str):
-    """Converts a place name to (lat, lng) via OpenStreetMap Nominatim."""
-    url = (
-        f"https://nominatim.openstreetmap.org/search"
-        f"?q={location_name}&format=json&limit=1"
-    )
-    headers = {"User-Agent": "SurakshaNet-App"}
-    try:
-        response = requests.get(url, headers=headers, timeout=10).json()
-        if response:
-            return float(response[0]["lat"]), float(response[0]["lon"])
-    except Exception:
-        pass
-    return None
+# get_coords and reverse_geocode live in app.services.geocoding
 
 
 # --------------------------------------------------
-# 6b. Helper: reverse geocode lat/lng → place name
+# 7. Helper: get road route from OSRM
 # --------------------------------------------------
-_rev_cache: dict[str, str] = {}
-
-
-def reverse_geocode(lat: float, lng: float, fallback: str = "") -> str:
-    key = f"{lat:.3f},{lng:.3f}"
-    if key in _rev_cache:
-        return _rev_cache[key]
+_osrm_flight = SingleFlight("osrm")
 
-    name = _mappls_reverse(lat, lng)
-    if not name:
-        name = _nominatim_reverse(lat, lng)
-    if not name:
-        name = fallback or f"{lat:.4f}, {lng:.4f}"
 
-    _rev_cache[key] = name
-    return name
-
-
-def _nominatim_reverse(lat: float, lng: float) -> str:
-    url = (
-        f"https://nominatim.openstreetmap.org/reverse"
-        f"?lat={lat}&lon={lng}&format=json&addressdetails=1"
-    )
-    headers = {"User-Agent": "SurakshaNet-App"}
-    try:
-        data = requests.get(url, headers=headers, timeout=6).json()
-        addr = data.get("address", {})
-        parts = []
-        road = addr.get("road") or addr.get("highway") or addr.get("path")
-        if road:
-            parts.append(road)
-        locality = (
-            addr.get("suburb")
-            or addr.get("neighbourhood")
-            or addr.get("village")
-            or addr.get("town")
-            or addr.get("city")
-        )
-        if locality:
-            parts.append(locality)
-        district = addr.get("state_district") or addr.get("county")
-        if district and district not in parts:
-            parts.append(district)
-        return ", ".join(parts) if parts else data.get("display_name", "")[:60]
-    except Exception:
-        return ""
+async def get_route_details(start_coords, end_coords):
+    # Identical concurrent route requests share one OSRM call
+    key = (*(round(c, 5) for c in start_coords), *(round(c, 5) for c in end_coords))
+    return await _osrm_flight.do(key, _fetch_route_details, start_coords, end_coords)
 
 
-def _mappls_reverse(lat: float, lng: float) -> str:
-    api_key = os.getenv("MAPPLS_API_KEY", "")
-    if not api_key:
-        return ""
-    url = (
-        f"https://apis.mappls.com/advancedmaps/v1/{api_key}/rev_geocode"
-        f"?lat={lat}&lng={lng}"
-    )
-    try:
-        data = requests.get(url, timeout=6).json()
-        results = data.get("results", [])
-        if results:
-            r = results[0]
-            parts = filter(None, [r.get("locality"), r.get("district"), r.get("state")])
-            return ", ".join(parts)
-    except Exception:
-        pass
-    return ""
-
-
-# --------------------------------------------------
-# 7. Helper: get road route from OSRM
-# --------------------------------------------------
-def get_route_details(start_coords, end_coords):
+async def _fetch_route_details(start_coords, end_coords):
     url = (
         f"http://router.project-osrm.org/route/v1/driving/"
         f"{start_coords[1]},{start_coords[0]};"
         f"{end_coords[1]},{end_coords[0]}"
-        f"?overview=full&geometries=geojson"
     )
     try:
-        response = requests.get(url, timeout=15).json()
+        response = await http_client.get_json(
+            url, params={"overview": "full", "geometries": "geojson"}, timeout=15
+        )
         if response.get("code") == "Ok":
             route = response["routes"][0]
             geometry = [[p[1], p[0]] for p in route["geometry"]["coordinates"]]
@@ -208,168 +230,384 @@ def get_route_details(start_coords, end_coords):
 # --------------------------------------------------
 # 7b. Helper: corridor distance filter
 # --------------------------------------------------
-def _haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    R = 6371.0
-    dlat = np.radians(lat2 - lat1)
-    dlng = np.radians(lng2 - lng1)
-    a = (
-        np.sin(dlat / 2) ** 2
-        + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlng / 2) ** 2
-    )
-    return R * 2 * np.arcsin(np.sqrt(a))
-
-
-def _point_to_segment_dist_km(
-    plat: float,
-    plng: float,
-    alat: float,
-    alng: float,
-    blat: float,
-    blng: float,
-) -> float:
-    ax, ay = alng, alat
-    bx, by = blng, blat
-    px, py = plng, plat
-    abx, aby = bx - ax, by - ay
-    apx, apy = px - ax, py - ay
-    ab2 = abx * abx + aby * aby
-    if ab2 == 0:
-        return _haversine_km(plat, plng, alat, alng)
-    t = max(0.0, min(1.0, (apx * abx + apy * aby) / ab2))
-    closest_lat = alat + t * (blat - alat)
-    closest_lng = alng + t * (blng - alng)
-    return _haversine_km(plat, plng, closest_lat, closest_lng)
-
-
 def filter_accidents_by_corridor(
     accidents_df: pd.DataFrame,
     route_geometry: list,
     corridor_km: float = 0.5,
+    index: GridIndex | None = None,
 ) -> pd.DataFrame:
+    """
+    Rows of ``accidents_df`` within ``corridor_km`` of the route polyline.
+
+    Adds two columns to the result: ``segment_idx`` (index of the nearest
+    route segment) and ``corridor_dist_km`` (distance to it). Pass the
+    ``GridIndex`` built over ``accidents_df`` to avoid a full-table bbox scan.
+    """
     if not route_geometry or len(route_geometry) < 2:
         return accidents_df.iloc[0:0]
     lats = [p[0] for p in route_geometry]
     lngs = [p[1] for p in route_geometry]
     pad = corridor_km / 111.0
-    bbox_mask = (
-        (accidents_df["Latitude"] >= min(lats) - pad)
-        & (accidents_df["Latitude"] <= max(lats) + pad)
-        & (accidents_df["Longitude"] >= min(lngs) - pad)
-        & (accidents_df["Longitude"] <= max(lngs) + pad)
-    )
-    candidates = accidents_df[bbox_mask]
+    if index is not None:
+        candidates = accidents_df.iloc[
+            index.bbox(
+                min(lats) - pad, max(lats) + pad, min(lngs) - pad, max(lngs) + pad
+            )
+        ]
+    else:
+        bbox_mask = (
+            (accidents_df["Latitude"] >= min(lats) - pad)
+            & (accidents_df["Latitude"] <= max(lats) + pad)
+            & (accidents_df["Longitude"] >= min(lngs) - pad)
+            & (accidents_df["Longitude"] <= max(lngs) + pad)
+        )
+        candidates = accidents_df[bbox_mask]
     if candidates.empty:
         return candidates
 
-    def within_corridor(row):
-        plat, plng = row["Latitude"], row["Longitude"]
-        for i in range(len(route_geometry) - 1):
-            a = route_geometry[i]
-            b = route_geometry[i + 1]
-            dist = _point_to_segment_dist_km(plat, plng, a[0], a[1], b[0], b[1])
-            if dist <= corridor_km:
-                return True
-        return False
-
-    mask = candidates.apply(within_corridor, axis=1)
-    return candidates[mask]
+    dist_km, seg_idx = nearest_segment(
+        candidates["Latitude"].to_numpy(),
+        candidates["Longitude"].to_numpy(),
+        route_geometry,
+        max_km=corridor_km,
+    )
+    mask = dist_km <= corridor_km
+    return candidates[mask].assign(
+        segment_idx=seg_idx[mask],
+        corridor_dist_km=dist_km[mask],
+    )
 
 
 # --------------------------------------------------
 # 8. Helper: build segmented path with risk colours
 # --------------------------------------------------
-def build_segmented_path(route_geometry: list, nearby_accidents: pd.DataFrame) -> list:
+ROUTE_SEGMENTS = int(os.getenv("ROUTE_SEGMENTS", "200"))
+SEGMENT_WINDOW_DEG = 0.005
+
+
+def build_segmented_path(
+    route_geometry: list,
+    n_segments: int = ROUTE_SEGMENTS,
+) -> list:
+    """
+    Split the route into ~``n_segments`` pieces coloured by local risk.
+
+    Each segment's risk is the mean Risk_Score inside a ±0.005° window
+    around its midpoint. All windows are answered from one summed-area
+    table over the accidents in the route's bounding box (fetched from
+    ``accident_index``), so finer segmentation costs almost nothing extra.
+    """
     if not route_geometry or len(route_geometry) < 2:
         return []
-    segments = []
-    step = max(1, len(route_geometry) // 20)
-    for i in range(0, len(route_geometry) - step, step):
-        seg_start = route_geometry[i]
-        seg_end = route_geometry[i + step]
-        mid_lat = (seg_start[0] + seg_end[0]) / 2
-        mid_lng = (seg_start[1] + seg_end[1]) / 2
-        mask = (df["Latitude"].between(mid_lat - 0.005, mid_lat + 0.005)) & (
-            df["Longitude"].between(mid_lng - 0.005, mid_lng + 0.005)
-        )
-        local_risk = float(df[mask]["Risk_Score"].mean()) if not df[mask].empty else 0.0
-        segments.append(
-            {
-                "coords": [seg_start, seg_end],
-                "risk": round(local_risk, 1),
-            }
-        )
-    return segments
+    step = max(1, len(route_geometry) // n_segments)
+    starts = np.arange(0, len(route_geometry) - step, step)
+    if starts.size == 0:
+        return []
+
+    points = np.asarray(route_geometry, dtype=np.float64)
+    mids = (points[starts] + points[starts + step]) / 2
+    w = SEGMENT_WINDOW_DEG
+    local = accident_index.bbox(
+        mids[:, 0].min() - w,
+        mids[:, 0].max() + w,
+        mids[:, 1].min() - w,
+        mids[:, 1].max() + w,
+    )
+    risks, _ = window_means(
+        df["Latitude"].to_numpy()[local],
+        df["Longitude"].to_numpy()[local],
+        df["Risk_Score"].to_numpy()[local],
+        mids[:, 0],
+        mids[:, 1],
+        half_deg=w,
+    )
+    return [
+        {
+            "coords": [route_geometry[i], route_geometry[i + step]],
+            "risk": round(float(risk), 1),
+        }
+        for i, risk in zip(starts.tolist(), risks)
+    ]
 
 
 # --------------------------------------------------
 # 9. Main Endpoint
 # --------------------------------------------------
-@app.post("/api/analyze-route")
-async def analyze_route(request: RouteRequest):
-    # Step 1 – geocode
-    start_coords = get_coords(request.start)
-    end_coords = get_coords(request.end)
-
-    if not start_coords or not end_coords:
+# Independent stages run concurrently; each has its own timeout and (where
+# the response can do without it) a fallback:
+#
+#   start_coords ─┬─ weather
+#   end_coords ───┴─ route ─┬─ route_weather
+#                           ├─ segments
+#                           └─ nearby ─── places
+ANALYZE_GEOCODE_TIMEOUT = float(os.getenv("ANALYZE_GEOCODE_TIMEOUT", "12"))
+ANALYZE_WEATHER_TIMEOUT = float(os.getenv("ANALYZE_WEATHER_TIMEOUT", "5"))
+ANALYZE_ROUTE_TIMEOUT = float(os.getenv("ANALYZE_ROUTE_TIMEOUT", "20"))
+ANALYZE_PLACES_TIMEOUT = float(os.getenv("ANALYZE_PLACES_TIMEOUT", "4"))
+REVERSE_GEOCODE_CONCURRENCY = int(os.getenv("REVERSE_GEOCODE_CONCURRENCY", "5"))
+
+
+async def _geocode_required(location_name: str):
+    coords = await get_coords(location_name)
+    if not coords:
         raise HTTPException(
             status_code=400, detail="Could not find location coordinates"
         )
+    return coords
+
+
+async def _stage_start_coords(start):
+    return await _geocode_required(start)
+
+
+async def _stage_end_coords(end):
+    return await _geocode_required(end)
+
+
+async def _stage_weather(start_coords):
+    return await get_weather(start_coords[0], start_coords[1])
+
+
+async def _stage_route_weather(route):
+    """Weather sampled along the geometry (bounded number of ~1 km cells)."""
+    route_geometry, _ = route
+    return summarize_route_weather(await sample_route_weather(route_geometry))
 
-    # Step 1b – fetch live weather at start location
-    from app.services.weather import get_weather
 
-    weather_data = get_weather(start_coords[0], start_coords[1])
+async def _stage_route(start_coords, end_coords):
+    return await get_route_details(start_coords, end_coords)
 
-    # Step 2 – road path
-    route_geometry, travel_time = get_route_details(start_coords, end_coords)
 
-    # Step 3 – filter accidents to the route corridor
+def _stage_nearby(start_coords, end_coords, route):
+    """Top-10 riskiest accidents in the route corridor (CPU, runs in a thread)."""
+    route_geometry, _ = route
     if route_geometry and len(route_geometry) >= 2:
-        corridor_df = filter_accidents_by_corridor(df, route_geometry, corridor_km=0.5)
+        corridor_df = filter_accidents_by_corridor(
+            df, route_geometry, corridor_km=0.5, index=accident_index
+        )
     else:
         min_lat, max_lat = sorted([start_coords[0], end_coords[0]])
         min_lng, max_lng = sorted([start_coords[1], end_coords[1]])
-        mask = (
-            (df["Latitude"] >= min_lat - 0.05)
-            & (df["Latitude"] <= max_lat + 0.05)
-            & (df["Longitude"] >= min_lng - 0.05)
-            & (df["Longitude"] <= max_lng + 0.05)
-        )
-        corridor_df = df[mask]
-    nearby_accidents = corridor_df.nlargest(10, "Risk_Score")
+        corridor_df = df.iloc[
+            accident_index.bbox(
+                min_lat - 0.05, max_lat + 0.05, min_lng - 0.05, max_lng + 0.05
+            )
+        ]
+    return corridor_df.nlargest(10, "Risk_Score")
+
+
+async def _stage_places(nearby):
+    """
+    Place name per accident row. Lookups still running after
+    ``ANALYZE_PLACES_TIMEOUT`` are dropped (the rows fall back to their CSV
+    city); the shared upstream calls finish anyway and warm the cache.
+    """
+    # Cap concurrent reverse lookups per request (Nominatim is rate-limited)
+    reverse_slots = asyncio.Semaphore(REVERSE_GEOCODE_CONCURRENCY)
+
+    async def lookup(row):
+        async with reverse_slots:
+            return await reverse_geocode(
+                row["Latitude"], row["Longitude"], fallback=str(row["City"])
+            )
+
+    tasks = {i: asyncio.ensure_future(lookup(row)) for i, row in nearby.iterrows()}
+    if not tasks:
+        return {}
+    _, pending = await asyncio.wait(tasks.values(), timeout=ANALYZE_PLACES_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    return {
+        i: task.result()
+        for i, task in tasks.items()
+        if task.done() and not task.cancelled() and task.exception() is None
+    }
 
-    # Step 4 – format accident points
-    accident_points = []
-    high_risk_locs = []
 
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+def _stage_segments(route):
+    return build_segmented_path(route[0])
+
+
+analyze_graph = StageGraph(
+    "analyze_route",
+    [
+        Stage("start_coords", _stage_start_coords, ("start",), ANALYZE_GEOCODE_TIMEOUT),
+        Stage("end_coords", _stage_end_coords, ("end",), ANALYZE_GEOCODE_TIMEOUT),
+        Stage(
+            "weather",
+            _stage_weather,
+            ("start_coords",),
+            ANALYZE_WEATHER_TIMEOUT,
+            fallback=None,
+        ),
+        Stage(
+            "route",
+            _stage_route,
+            ("start_coords", "end_coords"),
+            ANALYZE_ROUTE_TIMEOUT,
+            fallback=([], 0),
+        ),
+        Stage(
+            "route_weather",
+            _stage_route_weather,
+            ("route",),
+            ANALYZE_WEATHER_TIMEOUT,
+            fallback=None,
+        ),
+        Stage(
+            "nearby",
+            _stage_nearby,
+            ("start_coords", "end_coords", "route"),
+            blocking=True,
+        ),
+        Stage("places", _stage_places, ("nearby",), fallback=lambda **_: {}),
+        Stage(
+            "segments",
+            _stage_segments,
+            ("route",),
+            fallback=lambda **_: [],
+            blocking=True,
+        ),
+    ],
+    inputs=("start", "end"),
+)
 
-    rows = list(nearby_accidents.iterrows())
 
-    def enrich_row(item):
-        i, row = item
-        lat, lng = row["Latitude"], row["Longitude"]
-        csv_city = str(row["City"])
-        place = reverse_geocode(lat, lng, fallback=csv_city)
-        return i, row, place
+# --------------------------------------------------
+# 9b. Response cache
+# --------------------------------------------------
+# Serialized responses keyed on (normalized start, normalized end, hour
+# bucket, dataset hash, model version), stored without their two weather
+# fields. A hit splices in the current start-point and along-route weather
+# from the weather cache (falling through to a full run if a cell isn't
+# cached), so it never serves old conditions — and still makes no upstream
+# call and re-serializes only those two small objects. Entries are dropped
+# when the dataset or models change.
+ANALYZE_CACHE_SIZE = int(os.getenv("ANALYZE_CACHE_SIZE", "2048"))
+ANALYZE_CACHE_MAX_MB = float(os.getenv("ANALYZE_CACHE_MAX_MB", "64"))
+
+# value: (body without the weather fields and closing brace, route weather samples)
+analyze_cache = LRUCache(
+    ANALYZE_CACHE_SIZE,
+    max_bytes=int(ANALYZE_CACHE_MAX_MB * 1024 * 1024),
+    sizeof=lambda entry: len(entry[0]),
+)
+metrics.register_gauge("cache.analyze_route", analyze_cache.stats)
+_analyze_generation = None
+
+
+def _analysis_generation():
+    global _analyze_generation
+    generation = (
+        df.attrs.get("content_hash"),
+        model_registry.status()["model_version"],
+    )
+    if generation != _analyze_generation:
+        if _analyze_generation is not None:
+            analyze_cache.clear()
+        _analyze_generation = generation
+    return generation
+
+
+def _analysis_key(request: RouteRequest, hour_bucket: int) -> tuple:
+    return (
+        normalize_place(request.start),
+        normalize_place(request.end),
+        hour_bucket,
+        *_analysis_generation(),
+    )
 
-    enriched = {}
-    with ThreadPoolExecutor(max_workers=5) as pool:
-        futs = {pool.submit(enrich_row, item): item for item in rows}
-        for fut in as_completed(futs):
-            try:
-                idx, row, place = fut.result()
-                enriched[idx] = (row, place)
-            except Exception:
-                pass
 
+async def _cached_start_weather(request: RouteRequest) -> tuple[bool, dict | None]:
+    """``(found, weather)`` at the start point from the caches only."""
+    start_coords = await cached_coords(request.start)
+    if start_coords is None:
+        return False, None
+    return cached_weather(start_coords[0], start_coords[1])
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_json_default,
+    ).encode("utf-8")
+
+
+def _with_weather(prefix: bytes, weather, route_weather) -> bytes:
+    """Close a cached body with the given ``weather`` / ``route_weather``."""
+    return b"".join(
+        (
+            prefix,
+            b',"weather":',  # live weather data
+            _dumps(weather),
+            b',"route_weather":',  # sampled along the route
+            _dumps(route_weather),
+            b"}",
+        )
+    )
+
+
+def _json_response(body: bytes, cache_status: str) -> Response:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"X-Cache": cache_status},
+    )
+
+
+@app.post("/api/analyze-route")
+async def analyze_route(request: RouteRequest):
+    hour_bucket = int(time.time() // 3600)
+    key = _analysis_key(request, hour_bucket)
+    entry = analyze_cache.get(key)
+    if entry is not None:
+        prefix, samples = entry
+        found, weather = await _cached_start_weather(request)
+        if found:
+            found, route_weather = cached_route_weather(samples)
+        if found:
+            return _json_response(_with_weather(prefix, weather, route_weather), "HIT")
+
+    try:
+        stages = await analyze_graph.run(start=request.start, end=request.end)
+    except StageTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Upstream timeout: {e}")
+
+    prefix = _dumps(_build_analysis(stages))[:-1]  # drop the closing brace
+    # Degraded answers (a stage fell back, some place names missing) aren't cached
+    if not stages.fallbacks and len(stages["places"]) == len(stages["nearby"]):
+        samples = route_weather_samples(stages["route"][0])
+        analyze_cache.set(key, (prefix, samples), ttl=3600)
+    body = _with_weather(prefix, stages["weather"], stages["route_weather"])
+    return _json_response(body, "MISS")
+
+
+def _build_analysis(stages) -> dict:
+    start_coords = stages["start_coords"]
+    end_coords = stages["end_coords"]
+    route_geometry, travel_time = stages["route"]
+    nearby_accidents = stages["nearby"]
+    places = stages["places"]
+
+    # Format accident points
+    accident_points = []
+    high_risk_locs = []
     for i, row in nearby_accidents.iterrows():
-        row_data, place_name = enriched.get(i, (row, str(row["City"])))
+        place_name = places.get(i, str(row["City"]))
         accident_points.append(
             {
                 "id": str(i),
-                "lat": row["Latitude"],
-                "lng": row["Longitude"],
+                "lat": round(float(row["Latitude"]), 6),
+                "lng": round(float(row["Longitude"]), 6),
                 "severity": "high" if row["Risk_Score"] > 15 else "medium",
                 "accidents": 1,
                 "description": f"Risk Score: {row['Risk_Score']} in {row['City']}",
@@ -389,7 +627,7 @@ async def analyze_route(request: RouteRequest):
             }
         )
 
-    # Step 5 – aggregate risk
+    # Aggregate risk
     avg_risk = (
         nearby_accidents["Risk_Score"].mean() if not nearby_accidents.empty else 0
     )
@@ -398,9 +636,6 @@ async def analyze_route(request: RouteRequest):
         "High" if safety_score < 40 else "Moderate" if safety_score < 70 else "Safe"
     )
 
-    # Step 6 – build segmented path
-    segmented_path = build_segmented_path(route_geometry, nearby_accidents)
-
     return {
         "safety_score": safety_score,
         "risk_level": risk_level,
@@ -411,8 +646,8 @@ async def analyze_route(request: RouteRequest):
         "accident_points": accident_points,
         "high_risk_locations": high_risk_locs,
         "total_accidents": len(nearby_accidents),
-        "segmented_path": segmented_path,
-        "weather": weather_data,  # ← NEW: live weather data
+        "segmented_path": stages["segments"],
+        # weather / route_weather are appended by _with_weather
     }
 
 
@@ -0,0 +1,192 @@
+"""
+Memory-mapped columnar cache for the accident dataset.
+
+The first time a CSV is seen it is converted into one ``.npy`` file per
+column under ``ACCIDENTS_CACHE_DIR``:
+
+- Latitude / Longitude as float32
+- integer columns downcast to the smallest safe dtype
+- text columns dictionary-encoded (integer codes + a categories list)
+
+Each conversion lives in a directory named after the CSV's SHA-256, so a
+changed file is never served from a stale cache. Later starts (and every
+other uvicorn worker) memory-map those files read-only, which makes
+loading near-instant and lets all processes share one set of physical
+pages through the OS page cache.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_FORMAT = 1
+_DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent.parent / ".cache"
+CACHE_DIR = Path(
+    os.getenv("ACCIDENTS_CACHE_DIR", str(_DEFAULT_CACHE_DIR / "accidents"))
+)
+
+FLOAT32_COLUMNS = {"Latitude", "Longitude"}
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _codes_dtype(n_categories: int):
+    # Same width pandas picks for Categorical codes, so from_codes won't copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_json_atomic(path: Path, payload: dict):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(payload, fh)
+    os.replace(tmp, path)
+
+
+# --------------------------------------------------
+# CSV → columnar conversion
+# --------------------------------------------------
+def _build_cache(csv_path: Path, target: Path):
+    frame = pd.read_csv(csv_path)
+    tmp = Path(tempfile.mkdtemp(dir=target.parent, prefix=f"{target.name}.tmp-"))
+    os.chmod(tmp, 0o755)
+    columns = []
+    try:
+        for i, name in enumerate(frame.columns):
+            col = frame[name]
+            entry = {"name": name, "file": f"{i}.npy"}
+            if name in FLOAT32_COLUMNS:
+                arr = pd.to_numeric(col, errors="coerce").to_numpy(np.float32)
+                entry["kind"] = "numeric"
+            elif pd.api.types.is_bool_dtype(col):
+                arr = col.to_numpy(np.bool_)
+                entry["kind"] = "numeric"
+            elif pd.api.types.is_integer_dtype(col):
+                arr = pd.to_numeric(col, downcast="integer").to_numpy()
+                entry["kind"] = "numeric"
+            elif pd.api.types.is_float_dtype(col):
+                arr = col.to_numpy(np.float64)
+                entry["kind"] = "numeric"
+            else:
+                codes, uniques = pd.factorize(col.astype("string"), sort=True)
+                arr = codes.astype(_codes_dtype(len(uniques)))
+                entry["kind"] = "category"
+                entry["categories"] = f"{i}.categories.json"
+                with open(tmp / entry["categories"], "w") as fh:
+                    json.dump([str(u) for u in uniques], fh)
+            np.save(tmp / entry["file"], np.ascontiguousarray(arr))
+            columns.append(entry)
+
+        _write_json_atomic(
+            tmp / "meta.json",
+            {"format": CACHE_FORMAT, "rows": len(frame), "columns": columns},
+        )
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # Another worker finished the same conversion first — use theirs.
+            if not (target / "meta.json").exists():
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _resolve_cache(csv_path: Path, cache_dir: Path) -> Path:
+    """Directory holding the columnar copy of ``csv_path`` (built if needed)."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = cache_dir / "manifest.json"
+    stat = csv_path.stat()
+    source = {
+        "path": str(csv_path.resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+    try:
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        manifest = {}
+
+    # Fast path: file unchanged since we last hashed it
+    digest = None
+    known = manifest.get(source["path"])
+    if known and known.get("size") == source["size"]:
+        if known.get("mtime_ns") == source["mtime_ns"]:
+            digest = known.get("sha256")
+    if digest is None:
+        digest = _file_sha256(csv_path)
+
+    target = cache_dir / f"{digest[:32]}-v{CACHE_FORMAT}"
+    if not (target / "meta.json").exists():
+        print(f"[..] Building columnar accident cache at {target}")
+        _build_cache(csv_path, target)
+
+    if known != {**source, "sha256": digest}:
+        manifest[source["path"]] = {**source, "sha256": digest}
+        _write_json_atomic(manifest_path, manifest)
+    return target
+
+
+# --------------------------------------------------
+# Public API
+# --------------------------------------------------
+def load_accidents(
+    csv_path: str | os.PathLike,
+    columns: list[str] | None = None,
+    cache_dir: str | os.PathLike | None = None,
+) -> pd.DataFrame:
+    """
+    Load the accident CSV through the memory-mapped columnar cache.
+
+    ``columns`` restricts the result to the named columns (missing names
+    are ignored), which keeps high-cardinality text columns such as
+    Timestamp from being materialised when the service doesn't need them.
+    Numeric columns are read-only memory maps; categoricals are backed by
+    memory-mapped codes.
+
+    Raises FileNotFoundError if ``csv_path`` does not exist. If the cache
+    directory can't be written, falls back to a plain ``pd.read_csv``.
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(csv_path)
+
+    try:
+        target = _resolve_cache(csv_path, Path(cache_dir or CACHE_DIR))
+    except OSError as e:
+        print(f"[WARN] Accident cache unavailable ({e}); parsing CSV directly.")
+        frame = pd.read_csv(csv_path)
+        return frame[[c for c in columns if c in frame]] if columns else frame
+
+    with open(target / "meta.json") as fh:
+        meta = json.load(fh)
+
+    data = {}
+    for entry in meta["columns"]:
+        if columns is not None and entry["name"] not in columns:
+            continue
+        arr = np.load(target / entry["file"], mmap_mode="r")
+        if entry["kind"] == "category":
+            with open(target / entry["categories"]) as fh:
+                categories = json.load(fh)
+            arr = pd.Categorical.from_codes(arr, categories=categories)
+        data[entry["name"]] = arr
+
+    frame = pd.DataFrame(data, copy=False)
+    frame.attrs["content_hash"] = target.name.split("-")[0]
+    return frame
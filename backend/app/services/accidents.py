@@ -0,0 +1,75 @@
+"""
+The accident dataset and its spatial index, shared by every module.
+
+Loaded once per worker at import (through the memory-mapped columnar
+cache, see ``accident_store``). Both ``main`` (route analysis) and the
+API routes (server-side SOS hotspot lookup) read ``df`` and
+``accident_index`` from here.
+"""
+
+import os
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.services.accident_store import load_accidents
+from app.services.spatial import GridIndex
+
+# Explicitly load .env from the backend root (two levels up from this file)
+_ENV_PATH = Path(__file__).resolve().parent.parent.parent / ".env"
+load_dotenv(_ENV_PATH, override=True)
+
+CSV_PATH = os.getenv("ACCIDENTS_CSV_PATH", "final_merged_accidents.csv")
+# Only the columns the service reads are mapped in
+ACCIDENT_COLUMNS = [
+    "Latitude",
+    "Longitude",
+    "Risk_Score",
+    "City",
+    "Road_Condition",
+    "Location",
+]
+# Server-side "nearest hotspot": the most common Location among the
+# HOTSPOT_K accidents nearest to a point, if within HOTSPOT_MAX_KM
+HOTSPOT_K = int(os.getenv("HOTSPOT_K", "15"))
+HOTSPOT_MAX_KM = float(os.getenv("HOTSPOT_MAX_KM", "3"))
+
+try:
+    df = load_accidents(CSV_PATH, columns=ACCIDENT_COLUMNS)
+    print(f"[OK] Loaded {len(df)} accident records from {CSV_PATH}")
+except FileNotFoundError:
+    print(
+        f"[WARN] Accident CSV not found at '{CSV_PATH}'. "
+        "Route analysis will return empty results. "
+        "Set ACCIDENTS_CSV_PATH in your .env file."
+    )
+    df = pd.DataFrame(columns=ACCIDENT_COLUMNS)
+
+# Grid index over the coordinates — all bbox / radius lookups go through it
+accident_index = GridIndex(df["Latitude"], df["Longitude"])
+
+
+def nearest_hotspot(lat: float, lng: float) -> dict | None:
+    """
+    Accident hotspot nearest to (lat, lng) from the dataset: ``{"name",
+    "distance_km", "accidents"}``, or None when no recorded accident is
+    within ``HOTSPOT_MAX_KM``.
+    """
+    pos, dist = accident_index.nearest(lat, lng, HOTSPOT_K)
+    keep = dist <= HOTSPOT_MAX_KM
+    pos, dist = pos[keep], dist[keep]
+    if pos.size == 0 or "Location" not in df:
+        return None
+    names = df["Location"].to_numpy()[pos]
+    counts = Counter(str(n) for n in names)
+    # Most accidents nearby wins; ties go to the nearer location (names
+    # are ordered nearest first, and Counter keeps first-seen order)
+    name, count = counts.most_common(1)[0]
+    first = next(i for i, n in enumerate(names) if str(n) == name)
+    return {
+        "name": name,
+        "distance_km": round(float(dist[first]), 3),
+        "accidents": count,
+    }
@@ -0,0 +1,204 @@
+"""
+Fixed-capacity alert log with sequence cursors and an optional journal.
+
+Alerts live in a ring buffer (``deque(maxlen=...)``), so appending is
+O(1) and the oldest entry simply falls off. Every entry gets a ``seq``
+number that only grows; ``since(cursor)`` returns the entries after a
+cursor, so a dashboard polling every second downloads only what's new.
+``seq`` is local to this worker. For polling through a load balancer,
+filter on ``logged_at`` instead (``since_time``). That value is stamped
+by the worker that raised the alert and kept by the workers relaying it.
+
+With ``ALERT_JOURNAL`` set, alerts raised on this worker are also
+appended (one JSON line each) to that file, and the most recent
+``ALERT_LOG_SIZE`` entries are read back at startup, so history
+survives restarts. The journal rolls over to ``<path>.1`` once it passes
+``ALERT_JOURNAL_MAX_MB``. Workers may share one journal: appends and
+rollover happen under an ``flock`` on ``<path>.lock``, and a worker whose
+handle still points at a file another worker rotated reopens it first.
+"""
+
+import json
+import os
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no flock (Windows): one worker per journal
+
+ALERT_LOG_SIZE = int(os.getenv("ALERT_LOG_SIZE", "1000"))
+ALERT_JOURNAL = os.getenv("ALERT_JOURNAL", "")
+ALERT_JOURNAL_MAX_MB = float(os.getenv("ALERT_JOURNAL_MAX_MB", "16"))
+
+
+class AlertLog:
+    def __init__(
+        self,
+        capacity: int = ALERT_LOG_SIZE,
+        journal: str | Path | None = ALERT_JOURNAL or None,
+        journal_max_bytes: int = int(ALERT_JOURNAL_MAX_MB * 1024 * 1024),
+    ):
+        self.capacity = capacity
+        self._entries: deque[dict] = deque(maxlen=capacity)
+        self._seq = 0
+        self.journal = Path(journal) if journal else None
+        self.journal_max_bytes = journal_max_bytes
+        self._fh = None
+        self._lock_fh = None
+        if self.journal is not None:
+            self._open_lock()
+            with self._journal_lock():
+                self._restore()
+            self._open_journal()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def append(self, alert: dict, journal: bool = True) -> int:
+        """Add alert (stamping ``seq``); ``journal=False`` for relayed alerts."""
+        self._seq += 1
+        alert["seq"] = self._seq
+        self._entries.append(alert)
+        if journal and self._fh is not None:
+            self._write(alert)
+        return self._seq
+
+    def _write(self, alert: dict):
+        try:
+            line = json.dumps(alert, separators=(",", ":"), ensure_ascii=False)
+            with self._journal_lock():
+                self._follow_rotation()
+                if self._fh is None:
+                    return
+                self._fh.write(line + "\n")
+                if os.fstat(self._fh.fileno()).st_size >= self.journal_max_bytes:
+                    self._rotate()
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[WARN] Alert journal write failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def first_seq(self) -> int:
+        return self._seq - len(self._entries) + 1
+
+    def recent(self, limit: int = 20) -> list[dict]:
+        """The newest ``limit`` alerts, oldest first."""
+        limit = max(0, min(limit, len(self._entries)))
+        return list(islice(self._entries, len(self._entries) - limit, None))
+
+    def since(self, cursor: int, limit: int = 100) -> tuple[list[dict], bool]:
+        """
+        Alerts with ``seq > cursor`` (oldest first, at most ``limit``), and
+        whether some were missed because they already left the buffer
+        (or the cursor belongs to an earlier run of this worker).
+        """
+        reset = cursor > self._seq  # log was reset (restart): start over
+        if reset:
+            cursor = 0
+        start = cursor + 1 - self.first_seq
+        gap = reset or (start < 0 and cursor > 0)
+        start = max(start, 0)
+        return list(islice(self._entries, start, start + max(limit, 0))), gap
+
+    def since_time(self, since: str, limit: int = 100) -> list[dict]:
+        """Alerts logged strictly after ISO timestamp ``since``, oldest first."""
+        newer = []
+        # Entries arrive (almost) in logged_at order: scan back from the end
+        for alert in reversed(self._entries):
+            if alert.get("logged_at", "") <= since:
+                break
+            newer.append(alert)
+        newer.reverse()
+        return newer[:limit]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+    def _restore(self):
+        restored = deque(maxlen=self.capacity)
+        for path in (self.journal.with_name(self.journal.name + ".1"), self.journal):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    for line in fh:
+                        try:
+                            restored.append(json.loads(line))
+                        except ValueError:
+                            continue  # torn last line after a crash
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"[WARN] Could not read alert journal {path}: {e}")
+        for alert in restored:
+            self.append(alert, journal=False)
+        if restored:
+            print(
+                f"[OK] Alert log restored {len(restored)} entries from {self.journal}"
+            )
+
+    def _open_journal(self):
+        try:
+            self.journal.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.journal, "a", encoding="utf-8", buffering=1)
+        except OSError as e:
+            print(f"[WARN] Alert journal disabled ({self.journal}): {e}")
+            self._fh = None
+
+    def _open_lock(self):
+        if fcntl is None:
+            return
+        try:
+            self.journal.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_fh = open(
+                self.journal.with_name(self.journal.name + ".lock"), "a"
+            )
+        except OSError as e:
+            print(f"[WARN] Alert journal lock unavailable ({self.journal}): {e}")
+
+    @contextmanager
+    def _journal_lock(self):
+        """Exclusive across the workers sharing this journal (no-op without flock)."""
+        if self._lock_fh is None:
+            yield
+            return
+        fcntl.flock(self._lock_fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fh, fcntl.LOCK_UN)
+
+    def _follow_rotation(self):
+        """Reopen if another worker rotated the journal out from under us."""
+        try:
+            current = os.stat(self.journal).st_ino
+        except FileNotFoundError:
+            current = None
+        if self._fh is None or current != os.fstat(self._fh.fileno()).st_ino:
+            if self._fh is not None:
+                self._fh.close()
+            self._open_journal()
+
+    def _rotate(self):
+        self._fh.close()
+        os.replace(self.journal, self.journal.with_name(self.journal.name + ".1"))
+        self._open_journal()
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if self._lock_fh is not None:
+            self._lock_fh.close()
+            self._lock_fh = None
@@ -0,0 +1,282 @@
+"""
+Small caching primitives shared by the provider integrations.
+
+- ``LRUCache``: bounded, thread-safe in-memory LRU with per-entry expiry
+  and an optional byte budget.
+- ``SqliteStore``: JSON key/value table in a SQLite file (WAL mode), so
+  cached provider answers survive restarts and are shared by workers.
+- ``TieredCache``: an ``LRUCache`` in front of a ``SqliteStore``. Hits are
+  served from memory; a memory miss falls through to disk once and
+  promotes the entry. Async callers use ``aget`` / ``aset``, which run
+  the disk tier on a dedicated thread so SQLite never blocks the event
+  loop; ``purge_expired_periodically`` trims expired rows from every
+  store.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+CACHE_DIR = Path(
+    os.getenv("CACHE_DIR", Path(__file__).resolve().parent.parent.parent / ".cache")
+)
+CACHE_PURGE_INTERVAL = float(os.getenv("CACHE_PURGE_INTERVAL", "3600"))
+
+# One thread for all disk-tier I/O: keeps SQLite off the event loop and
+# away from the default executor, and applies writes in order
+_disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-disk")
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry.
+
+    With ``max_bytes`` the cache also evicts until the summed
+    ``sizeof(value)`` (default ``len``) fits the budget; a single value
+    larger than the budget is not stored.
+    """
+
+    def __init__(self, maxsize: int = 1024, max_bytes: int | None = None, sizeof=len):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._data: OrderedDict = OrderedDict()  # key → (expires_at, value, size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value, _ = entry
+                if expires_at is None or expires_at > time.time():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (expires_at, value, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def _remove(self, key):
+        entry = self._data.pop(key)
+        self.nbytes -= entry[2]
+        return entry
+
+    def items(self) -> list:
+        """Snapshot of the live ``(key, value)`` pairs (LRU order untouched)."""
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value)
+                for key, (expires_at, value, _) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        if self.max_bytes is not None:
+            stats.update(bytes=self.nbytes, max_bytes=self.max_bytes)
+        return stats
+
+
+class SqliteStore:
+    """JSON values in one SQLite table, with optional per-row expiry."""
+
+    def __init__(self, path, table: str):
+        self.path = Path(path)
+        self.table = table
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def entry(self, key: str):
+        """``(expires_at, value)`` for a live key, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT expires_at, value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[0] is not None and row[0] <= time.time()):
+            return None
+        return row[0], json.loads(row[1])
+
+    def get(self, key: str, default=None):
+        entry = self.entry(key)
+        return default if entry is None else entry[1]
+
+    def set(self, key: str, value, ttl: float | None = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)
+            )
+        return cur.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return row[0]
+
+
+class TieredCache:
+    """
+    Memory LRU backed by a ``SqliteStore``.
+
+    ``get`` returns ``(found, value)`` so a cached ``None`` (e.g. a
+    negative lookup result) is distinguishable from a miss. If the store
+    can't be opened the cache degrades to memory only.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, path=None):
+        self.name = name
+        self.memory = LRUCache(maxsize)
+        try:
+            self.store = SqliteStore(path or CACHE_DIR / f"{name}.sqlite3", name)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[WARN] {name} cache is memory-only (disk store unavailable: {e})")
+            self.store = None
+        _tiered_caches.append(self)
+
+    def get(self, key: str):
+        """Blocking lookup (memory, then disk); async code uses ``aget``."""
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return True, value
+        return self._promote(key, self._disk_entry(key))
+
+    async def aget(self, key: str):
+        """``get`` for the event loop: a memory miss reads disk off-loop."""
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return True, value
+        if self.store is None:
+            return False, None
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(_disk_executor, self._disk_entry, key)
+        return self._promote(key, entry)
+
+    def _disk_entry(self, key: str):
+        if self.store is None:
+            return None
+        try:
+            return self.store.entry(key)
+        except sqlite3.Error:
+            return None
+
+    def _promote(self, key: str, entry):
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        ttl = expires_at - time.time() if expires_at is not None else None
+        self.memory.set(key, value, ttl)
+        return True, value
+
+    def set(self, key: str, value, ttl: float | None = None):
+        """Blocking write-through; async code uses ``aset``."""
+        self.memory.set(key, value, ttl)
+        self._disk_set(key, value, ttl)
+
+    async def aset(self, key: str, value, ttl: float | None = None):
+        """``set`` for the event loop: the disk write runs off-loop."""
+        self.memory.set(key, value, ttl)
+        if self.store is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(_disk_executor, self._disk_set, key, value, ttl)
+
+    def _disk_set(self, key: str, value, ttl: float | None):
+        if self.store is None:
+            return
+        try:
+            self.store.set(key, value, ttl)
+        except sqlite3.Error as e:
+            print(f"[WARN] {self.name} cache write failed: {e}")
+
+    def purge_expired(self) -> int:
+        if self.store is None:
+            return 0
+        try:
+            return self.store.purge_expired()
+        except sqlite3.Error as e:
+            print(f"[WARN] {self.name} cache purge failed: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        return {
+            **self.memory.stats(),
+            "persisted": len(self.store) if self.store is not None else None,
+        }
+
+
+_tiered_caches: list[TieredCache] = []
+
+
+async def purge_expired_periodically(interval: float = CACHE_PURGE_INTERVAL):
+    """Delete expired rows from every ``TieredCache`` store, every ``interval`` s."""
+    loop = asyncio.get_running_loop()
+    while True:
+        for cache in list(_tiered_caches):
+            removed = await loop.run_in_executor(_disk_executor, cache.purge_expired)
+            if removed:
+                print(f"[OK] {cache.name} cache: purged {removed} expired entries")
+        await asyncio.sleep(interval)
@@ -3,19 +3,33 @@ Groq-powered AI chatbot service for Suraksha-Net.
 
 Provides road safety advice, accident pattern analysis, and
 natural-language route query interpretation.
+
+Completions are streamed from one reused ``AsyncGroq`` client (pooled
+keep-alive connections, non-blocking I/O), so a generation never holds
+up the event loop. ``chat_stream`` yields tokens as they arrive and
+pulls the ```route``` block out of the text incrementally;
+``chat`` collects the same stream into a single reply. Time to first
+token is reported to ``metrics`` as ``groq.ttft``.
 """
 
+import asyncio
 import os
-import re
 import json
+import time
 from pathlib import Path
-from groq import Groq
+from groq import AsyncGroq
 from dotenv import load_dotenv
 
+from app.services.metrics import metrics
+
 # Explicitly load .env from the backend root (two levels up from this file)
 _ENV_PATH = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(_ENV_PATH, override=True)
 
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "1"))
+
 SYSTEM_PROMPT = """You are **Suraksha** — the AI road-safety assistant for **Suraksha-Net**, an intelligent road safety platform built for Pune, India.
 
 ## Your capabilities
@@ -46,8 +60,12 @@ The frontend will parse this and trigger navigation automatically.
 """
 
 
-def get_client() -> Groq | None:
-    """Lazily initialize Groq client (reads key at call time)."""
+# (event loop, api key) → client; reused so its connection pool persists
+_clients: dict[tuple[int, str], AsyncGroq] = {}
+
+
+def get_client() -> AsyncGroq | None:
+    """Shared Groq client for this event loop (reads key at call time)."""
     api_key = os.getenv("GROQ_API_KEY", "")
     if not api_key:
         # Safety net: try loading .env again in case it wasn't loaded earlier
@@ -55,54 +73,193 @@ def get_client() -> Groq | None:
         api_key = os.getenv("GROQ_API_KEY", "")
     if not api_key:
         return None
-    return Groq(api_key=api_key)
+    key = (id(asyncio.get_running_loop()), api_key)
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncGroq(
+            api_key=api_key, timeout=GROQ_TIMEOUT, max_retries=GROQ_MAX_RETRIES
+        )
+        _clients[key] = client
+    return client
 
 
-def chat(messages: list[dict[str, str]]) -> dict:
+async def aclose():
+    """Close the pooled clients (app shutdown)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
+
+
+# --------------------------------------------------
+# Incremental ```route``` block extraction
+# --------------------------------------------------
+class RouteBlockParser:
+    """
+    Splits streamed text into what the user should see and the
+    ```route {...}``` block (hidden, parsed as soon as it closes).
+    Text that might be the start of a fence is held back until the
+    next chunk shows whether it is.
     """
-    Send a conversation to Groq and return the assistant reply.
 
-    Parameters
-    ----------
-    messages : list of {"role": "user"|"assistant", "content": str}
-        The conversation history (excluding the system prompt).
+    OPEN = "```route"
+    CLOSE = "```"
 
-    Returns
-    -------
-    dict with keys: reply (str), route (dict|None)
+    def __init__(self):
+        self._buf = ""
+        self._block: list[str] = []
+        self._in_block = False
+        self.route: dict | None = None
+
+    def feed(self, text: str) -> tuple[str, dict | None]:
+        """Returns (visible text, route if a block just closed)."""
+        self._buf += text
+        visible: list[str] = []
+        found = None
+        while True:
+            if not self._in_block:
+                idx = self._buf.find(self.OPEN)
+                if idx < 0:
+                    keep = self._partial(self._buf, self.OPEN)
+                    visible.append(self._buf[: len(self._buf) - keep])
+                    self._buf = self._buf[len(self._buf) - keep :]
+                    break
+                visible.append(self._buf[:idx])
+                self._buf = self._buf[idx + len(self.OPEN) :]
+                self._in_block = True
+            else:
+                idx = self._buf.find(self.CLOSE)
+                if idx < 0:
+                    keep = self._partial(self._buf, self.CLOSE)
+                    self._block.append(self._buf[: len(self._buf) - keep])
+                    self._buf = self._buf[len(self._buf) - keep :]
+                    break
+                self._block.append(self._buf[:idx])
+                self._buf = self._buf[idx + len(self.CLOSE) :]
+                self._in_block = False
+                found = self._parse("".join(self._block)) or found
+                self._block = []
+        return "".join(visible), found
+
+    def finish(self) -> tuple[str, dict | None]:
+        """Flush held-back text at the end of the stream."""
+        rest, self._buf = self._buf, ""
+        if self._in_block:
+            # Unterminated block: use it if it parses, never show it
+            return "", self._parse("".join(self._block) + rest)
+        return rest, None
+
+    def _parse(self, body: str) -> dict | None:
+        try:
+            route = json.loads(body.strip())
+        except json.JSONDecodeError:
+            return None
+        if isinstance(route, dict):
+            self.route = route
+            return route
+        return None
+
+    @staticmethod
+    def _partial(buf: str, marker: str) -> int:
+        """Length of the longest suffix of ``buf`` that starts ``marker``."""
+        for k in range(min(len(buf), len(marker) - 1), 0, -1):
+            if marker.startswith(buf[-k:]):
+                return k
+        return 0
+
+
+# --------------------------------------------------
+# Completions
+# --------------------------------------------------
+_NO_KEY_REPLY = (
+    "Groq API key is not configured. Add GROQ_API_KEY to your backend .env "
+    "file to enable the AI assistant."
+)
+
+
+async def chat_stream(
+    messages: list[dict[str, str]],
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+):
+    """
+    Stream a Groq completion for the conversation as events:
+
+        {"type": "token", "text": str}          visible reply text
+        {"type": "route", "route": dict}        parsed ```route``` block
+        {"type": "done", "reply": str, "route": dict | None}
+        {"type": "error", "message": str}       (followed by "done")
+
+    ``done.reply`` is the full raw reply (route block included), as
+    returned by ``chat``.
     """
     client = get_client()
     if client is None:
-        return {
-            "reply": "Groq API key is not configured. Add GROQ_API_KEY to your backend .env file to enable the AI assistant.",
-            "route": None,
-        }
+        yield {"type": "token", "text": _NO_KEY_REPLY}
+        yield {"type": "done", "reply": _NO_KEY_REPLY, "route": None}
+        return
 
     # Prepend system prompt
     full_messages = [{"role": "system", "content": SYSTEM_PROMPT}] + messages
-
+    parser = RouteBlockParser()
+    parts: list[str] = []
+    started = time.perf_counter()
+    stream = None
     try:
-        response = client.chat.completions.create(
-            model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+        stream = await client.chat.completions.create(
+            model=GROQ_MODEL,
             messages=full_messages,
-            temperature=0.7,
-            max_tokens=1024,
+            temperature=temperature,
+            max_tokens=max_tokens,
             top_p=0.95,
+            stream=True,
         )
-        reply = response.choices[0].message.content or ""
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if not parts:
+                metrics.observe("groq.ttft", time.perf_counter() - started)
+            parts.append(delta)
+            visible, route = parser.feed(delta)
+            if visible:
+                yield {"type": "token", "text": visible}
+            if route is not None:
+                yield {"type": "route", "route": route}
     except Exception as e:
-        return {
-            "reply": f"Sorry, I encountered an error: {str(e)}",
-            "route": None,
-        }
-
-    # Extract route JSON if present
-    route = None
-    route_match = re.search(r"```route\s*\n({.*?})\s*\n```", reply, re.DOTALL)
-    if route_match:
-        try:
-            route = json.loads(route_match.group(1))
-        except json.JSONDecodeError:
-            pass
+        metrics.incr("groq.errors")
+        message = f"Sorry, I encountered an error: {str(e)}"
+        yield {"type": "error", "message": message}
+        yield {"type": "done", "reply": "".join(parts) or message, "route": None}
+        return
+    finally:
+        if stream is not None:
+            await stream.close()
+        metrics.observe("groq.completion", time.perf_counter() - started)
+
+    visible, route = parser.finish()
+    if visible:
+        yield {"type": "token", "text": visible}
+    if route is not None:
+        yield {"type": "route", "route": route}
+    yield {"type": "done", "reply": "".join(parts), "route": parser.route}
+
 
-    return {"reply": reply, "route": route}
+async def chat(messages: list[dict[str, str]]) -> dict:
+    """
+    Send a conversation to Groq and return the assistant reply.
+
+    Parameters
+    ----------
+    messages : list of {"role": "user"|"assistant", "content": str}
+        The conversation history (excluding the system prompt).
+
+    Returns
+    -------
+    dict with keys: reply (str), route (dict|None)
+    """
+    result = {"reply": "", "route": None}
+    async for event in chat_stream(messages):
+        if event["type"] == "done":
+            result = {"reply": event["reply"], "route": event["route"]}
+    return result
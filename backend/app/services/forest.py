@@ -0,0 +1,91 @@
+"""
+Flattened RandomForest evaluator for low-latency scoring.
+
+sklearn's ``predict_proba`` on a single row spends most of its time in
+input validation and joblib dispatch rather than walking trees. This
+module exports a trained ``RandomForestClassifier`` into contiguous
+NumPy node arrays (feature, threshold, children, leaf probabilities)
+and scores one row or a batch by advancing every (row, tree) pair one
+level per step — pure NumPy, no sklearn on the request path.
+"""
+
+import numpy as np
+
+
+class FlatForest:
+    """All trees of a fitted forest packed into shared node arrays."""
+
+    def __init__(self, feature, threshold, left, right, values, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # children[2 * node + went_right] — one gather per level
+        self.children = np.stack([left, right], axis=1).ravel()
+        self.values = values
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+        self.n_classes = values.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        """Export a fitted ``RandomForestClassifier`` (single output)."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            leaf = left < 0
+            own = np.arange(n, dtype=np.int64)
+            # Leaves point at themselves so extra traversal steps are no-ops
+            left = np.where(leaf, own, left) + offset
+            right = np.where(leaf, own, right) + offset
+
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            values=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+        )
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, shape (n_rows, n_classes) — matches sklearn."""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[None, :]
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = X.astype(np.float32).astype(np.float64)
+        n, n_features = X.shape
+
+        flat_x = X.ravel()
+        row_base = (np.arange(n, dtype=np.int64) * n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = flat_x.take(row_base + self.feature.take(nodes))
+            went_right = x > self.threshold.take(nodes)
+            nodes = self.children.take(2 * nodes + went_right)
+        return self.values.take(nodes, axis=0).mean(axis=1)
+
+    def predict(self, X) -> np.ndarray:
+        """Encoded class index per row (argmax of ``predict_proba``)."""
+        return self.predict_proba(X).argmax(axis=1)
@@ -0,0 +1,139 @@
+"""
+Vectorized geometry helpers for route corridor analysis.
+
+Provides a batched point-to-polyline distance kernel that works on whole
+coordinate arrays, chunked so memory stays bounded for long OSRM
+geometries and large accident datasets.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.0
+
+# Upper bound on point × segment pairs evaluated at once (~8 bytes each per
+# temporary array, so the default keeps every temporary around 16 MB).
+CHUNK_PAIRS = 2_000_000
+# Points are processed in spatially sorted blocks of this size so each block
+# only has to be tested against the route segments that pass near it.
+CHUNK_ROWS = 1024
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km; accepts scalars or broadcastable arrays."""
+    dlat = np.radians(lat2 - lat1)
+    dlng = np.radians(lng2 - lng1)
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlng / 2) ** 2
+    )
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(a))
+
+
+def nearest_segment(
+    lats,
+    lngs,
+    route_geometry,
+    max_km: float = np.inf,
+    chunk_pairs: int = CHUNK_PAIRS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Distance from every point to the nearest segment of a polyline.
+
+    Each point is projected onto each segment in lat/lng space (clamped to
+    the segment ends) and the haversine distance to that projection is
+    taken — the same measure the per-row corridor filter used.
+
+    Parameters
+    ----------
+    lats, lngs : array-like of shape (n,)
+    route_geometry : sequence of [lat, lng] with at least two points
+    max_km : float
+        Optional search radius. Segments whose padded bounding box cannot
+        come within ``max_km`` of a block of points are skipped; points with
+        no segment within range get ``inf`` / ``-1``.
+    chunk_pairs : int
+        Memory bound on point × segment pairs per vectorized step.
+
+    Returns
+    -------
+    (dist_km, seg_idx) : float64 array and int64 array of shape (n,)
+    """
+    plat_all = np.asarray(lats, dtype=np.float64)
+    plng_all = np.asarray(lngs, dtype=np.float64)
+    n = plat_all.shape[0]
+    dist = np.full(n, np.inf)
+    seg_idx = np.full(n, -1, dtype=np.int64)
+
+    route = np.asarray(route_geometry, dtype=np.float64)
+    if n == 0 or route.ndim != 2 or len(route) < 2:
+        return dist, seg_idx
+
+    alat, alng = route[:-1, 0], route[:-1, 1]
+    blat, blng = route[1:, 0], route[1:, 1]
+    dlat, dlng = blat - alat, blng - alng
+    ab2 = dlat * dlat + dlng * dlng
+    # Zero-length segments collapse to their start point (t = 0)
+    inv_ab2 = np.divide(1.0, ab2, out=np.zeros_like(ab2), where=ab2 > 0)
+
+    prune = np.isfinite(max_km)
+    if prune:
+        seg_lat_lo, seg_lat_hi = np.minimum(alat, blat), np.maximum(alat, blat)
+        seg_lng_lo, seg_lng_hi = np.minimum(alng, blng), np.maximum(alng, blng)
+        pad_lat = max_km / KM_PER_DEG_LAT
+
+    # Sort along the route's longer axis so each block is spatially compact
+    if np.ptp(route[:, 0]) >= np.ptp(route[:, 1]):
+        order = np.argsort(plat_all, kind="stable")
+    else:
+        order = np.argsort(plng_all, kind="stable")
+
+    all_segs = np.arange(len(alat))
+    for start in range(0, n, CHUNK_ROWS):
+        rows = order[start : start + CHUNK_ROWS]
+        plat = plat_all[rows]
+        plng = plng_all[rows]
+
+        if prune:
+            lat_lo, lat_hi = plat.min() - pad_lat, plat.max() + pad_lat
+            cos_lat = np.cos(np.radians(min(89.0, max(abs(lat_lo), abs(lat_hi)))))
+            pad_lng = pad_lat / max(cos_lat, 1e-6)
+            lng_lo, lng_hi = plng.min() - pad_lng, plng.max() + pad_lng
+            segs = np.flatnonzero(
+                (seg_lat_hi >= lat_lo)
+                & (seg_lat_lo <= lat_hi)
+                & (seg_lng_hi >= lng_lo)
+                & (seg_lng_lo <= lng_hi)
+            )
+            if segs.size == 0:
+                continue
+        else:
+            segs = all_segs
+
+        best_d = np.full(len(rows), np.inf)
+        best_i = np.full(len(rows), -1, dtype=np.int64)
+        seg_block = max(1, chunk_pairs // len(rows))
+        pcol_lat = plat[:, None]
+        pcol_lng = plng[:, None]
+        for s0 in range(0, segs.size, seg_block):
+            s = segs[s0 : s0 + seg_block]
+            t = (
+                (pcol_lng - alng[s]) * dlng[s] + (pcol_lat - alat[s]) * dlat[s]
+            ) * inv_ab2[s]
+            np.clip(t, 0.0, 1.0, out=t)
+            d = haversine_km(
+                pcol_lat,
+                pcol_lng,
+                alat[s] + t * dlat[s],
+                alng[s] + t * dlng[s],
+            )
+            j = np.argmin(d, axis=1)
+            dj = d[np.arange(len(rows)), j]
+            better = dj < best_d
+            best_d[better] = dj[better]
+            best_i[better] = s[j[better]]
+
+        dist[rows] = best_d
+        seg_idx[rows] = best_i
+
+    return dist, seg_idx
@@ -0,0 +1,291 @@
+"""
+Forward (place name → lat/lng) and reverse (lat/lng → place name)
+geocoding via OpenStreetMap Nominatim and Mappls.
+
+Users query the same few hundred place names over and over, and route
+analysis labels the same accident hotspots again and again, so both
+directions are kept in a ``TieredCache``: a bounded in-memory LRU in
+front of a SQLite file that survives restarts.
+
+- Forward keys are normalized so that "FC Road, Pune" and "fc road"
+  share one entry. "Not found" answers are cached with a shorter TTL;
+  network errors are never cached.
+- Reverse keys snap coordinates to a ``REVERSE_GEOCODE_GRID_DEG`` grid
+  (~100 m), so nearby points share one lookup. Empty answers are cached
+  with a shorter TTL; transport errors, 429s and 5xx are never cached.
+  ``prewarm_reverse`` fills the cache for known hotspots in the
+  background at startup, in one worker per host (a lock file in the
+  cache directory) so the rate limit holds across workers.
+"""
+
+import asyncio
+import os
+import re
+import unicodedata
+
+import httpx
+
+from app.services import http_client
+from app.services.cache import CACHE_DIR, TieredCache
+from app.services.metrics import metrics
+from app.services.singleflight import SingleFlight
+
+NOMINATIM_HEADERS = {"User-Agent": "SurakshaNet-App"}
+
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+GEOCODE_TTL = float(os.getenv("GEOCODE_TTL", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", "3600"))
+# Trailing ", <region>" parts that don't change which place is meant
+GEOCODE_DROP_SUFFIXES = {
+    s.strip().lower()
+    for s in os.getenv(
+        "GEOCODE_DROP_SUFFIXES", "pune,pune city,maharashtra,india"
+    ).split(",")
+    if s.strip()
+}
+
+_ABBREV = re.compile(r"[.'’]")  # "F.C." → "fc", "St. Mary's" → "st marys"
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+REVERSE_GEOCODE_CACHE_SIZE = int(os.getenv("REVERSE_GEOCODE_CACHE_SIZE", "20000"))
+REVERSE_GEOCODE_GRID_DEG = float(os.getenv("REVERSE_GEOCODE_GRID_DEG", "0.001"))
+REVERSE_GEOCODE_TTL = float(os.getenv("REVERSE_GEOCODE_TTL", str(90 * 24 * 3600)))
+REVERSE_GEOCODE_NEGATIVE_TTL = float(os.getenv("REVERSE_GEOCODE_NEGATIVE_TTL", "900"))
+REVERSE_PREWARM_LOCK = CACHE_DIR / "geocode_reverse.prewarm.lock"
+
+forward_cache = TieredCache("geocode_forward", maxsize=GEOCODE_CACHE_SIZE)
+reverse_cache = TieredCache("geocode_reverse", maxsize=REVERSE_GEOCODE_CACHE_SIZE)
+metrics.register_gauge("cache.geocode_forward", forward_cache.stats)
+metrics.register_gauge("cache.geocode_reverse", reverse_cache.stats)
+
+# Concurrent misses for the same key share one upstream lookup
+_forward_flight = SingleFlight("geocode")
+_reverse_flight = SingleFlight("reverse_geocode")
+
+
+def _clean(text: str) -> str:
+    return _SPACES.sub(" ", _PUNCT.sub(" ", _ABBREV.sub("", text))).strip()
+
+
+def normalize_place(name: str) -> str:
+    """
+    Cache key for a free-text place name: case-folded, punctuation and
+    repeated whitespace removed, trailing region suffixes (", Pune",
+    ", Maharashtra", ...) dropped unless nothing else would remain.
+    """
+    text = unicodedata.normalize("NFKC", name).casefold()
+    parts = [_clean(p) for p in text.split(",")]
+    parts = [p for p in parts if p]
+    while len(parts) > 1 and parts[-1] in GEOCODE_DROP_SUFFIXES:
+        parts.pop()
+    return " ".join(parts)
+
+
+async def cached_coords(location_name: str):
+    """Coordinates from the cache only (None if unknown or not cached)."""
+    found, cached = await forward_cache.aget(normalize_place(location_name))
+    return tuple(cached) if found and cached else None
+
+
+async def get_coords(location_name: str):
+    """Converts a place name to (lat, lng) via OpenStreetMap Nominatim."""
+    key = normalize_place(location_name)
+    if not key:
+        return None
+    found, cached = await forward_cache.aget(key)
+    if found:
+        return tuple(cached) if cached else None
+    return await _forward_flight.do(key, _fetch_coords, key, location_name)
+
+
+async def _fetch_coords(key: str, location_name: str):
+    try:
+        response = await http_client.get_json(
+            "https://nominatim.openstreetmap.org/search",
+            params={
+                "q": _SPACES.sub(" ", location_name).strip(),
+                "format": "json",
+                "limit": 1,
+            },
+            headers=NOMINATIM_HEADERS,
+            timeout=10,
+        )
+    except Exception:
+        return None
+
+    if response:
+        try:
+            coords = float(response[0]["lat"]), float(response[0]["lon"])
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+        await forward_cache.aset(key, list(coords), GEOCODE_TTL)
+        return coords
+    await forward_cache.aset(key, None, GEOCODE_NEGATIVE_TTL)
+    return None
+
+
+# --------------------------------------------------
+# Reverse geocoding
+# --------------------------------------------------
+def snap(lat: float, lng: float) -> tuple[int, int]:
+    """Grid cell of a coordinate (``REVERSE_GEOCODE_GRID_DEG`` per step)."""
+    return (
+        round(float(lat) / REVERSE_GEOCODE_GRID_DEG),
+        round(float(lng) / REVERSE_GEOCODE_GRID_DEG),
+    )
+
+
+def _reverse_key(cell: tuple[int, int]) -> str:
+    return f"{REVERSE_GEOCODE_GRID_DEG:g}:{cell[0]}:{cell[1]}"
+
+
+async def reverse_geocode(lat: float, lng: float, fallback: str = "") -> str:
+    cell = snap(lat, lng)
+    key = _reverse_key(cell)
+    found, name = await reverse_cache.aget(key)
+    if not found:
+        name = await _reverse_flight.do(key, _fetch_reverse, key, cell)
+    return name or fallback or f"{lat:.4f}, {lng:.4f}"
+
+
+async def _fetch_reverse(key: str, cell: tuple[int, int]) -> str | None:
+    # Look up the cell centre so every point in the cell gets one answer
+    c_lat = cell[0] * REVERSE_GEOCODE_GRID_DEG
+    c_lng = cell[1] * REVERSE_GEOCODE_GRID_DEG
+    name = await _mappls_reverse(c_lat, c_lng)
+    failed = name is None
+    if not name:
+        name = await _nominatim_reverse(c_lat, c_lng)
+        failed = failed or name is None
+    if name:
+        await reverse_cache.aset(key, name, REVERSE_GEOCODE_TTL)
+        return name
+    if failed:
+        # A provider was unreachable or throttled: don't remember a miss
+        metrics.incr("geocode.reverse_errors")
+        return None
+    await reverse_cache.aset(key, None, REVERSE_GEOCODE_NEGATIVE_TTL)
+    return None
+
+
+def _claim_prewarm():
+    """
+    Exclusive lock on ``REVERSE_PREWARM_LOCK``: the open file while held,
+    False if another worker holds it, None where locking isn't available.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return None  # no flock (Windows): every process prewarms
+    try:
+        REVERSE_PREWARM_LOCK.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(REVERSE_PREWARM_LOCK, "w")
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return False
+    return fh
+
+
+async def prewarm_reverse(lats, lngs, rate_per_sec: float = 1.0) -> int | None:
+    """
+    Resolve every not-yet-cached cell among ``lats``/``lngs`` (in order),
+    at most ``rate_per_sec`` upstream lookups per second — Nominatim's
+    usage policy allows one. Only one worker per cache directory runs
+    it; the others return None at once. Returns the number of cells
+    looked up (0 without touching the network if ``rate_per_sec`` <= 0,
+    which disables prewarming).
+    """
+    if not rate_per_sec > 0:
+        return 0
+    lock = _claim_prewarm()
+    if lock is False:
+        return None
+    try:
+        seen = set()
+        looked_up = 0
+        for lat, lng in zip(lats, lngs):
+            cell = snap(lat, lng)
+            if cell in seen:
+                continue
+            seen.add(cell)
+            if (await reverse_cache.aget(_reverse_key(cell)))[0]:
+                continue
+            await reverse_geocode(lat, lng)
+            looked_up += 1
+            await asyncio.sleep(1.0 / rate_per_sec)
+        return looked_up
+    finally:
+        if lock:
+            lock.close()
+
+
+def _transient(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return True  # transport error, timeout or a non-JSON body
+
+
+async def _nominatim_reverse(lat: float, lng: float) -> str | None:
+    """Place name, "" if Nominatim has none, None if the lookup failed."""
+    try:
+        data = await http_client.get_json(
+            "https://nominatim.openstreetmap.org/reverse",
+            params={"lat": lat, "lon": lng, "format": "json", "addressdetails": 1},
+            headers=NOMINATIM_HEADERS,
+            timeout=6,
+            raise_for_status=True,
+        )
+    except Exception as e:
+        return None if _transient(e) else ""
+    try:
+        addr = data.get("address", {})
+        parts = []
+        road = addr.get("road") or addr.get("highway") or addr.get("path")
+        if road:
+            parts.append(road)
+        locality = (
+            addr.get("suburb")
+            or addr.get("neighbourhood")
+            or addr.get("village")
+            or addr.get("town")
+            or addr.get("city")
+        )
+        if locality:
+            parts.append(locality)
+        district = addr.get("state_district") or addr.get("county")
+        if district and district not in parts:
+            parts.append(district)
+        return ", ".join(parts) if parts else data.get("display_name", "")[:60]
+    except (AttributeError, TypeError):
+        return ""
+
+
+async def _mappls_reverse(lat: float, lng: float) -> str | None:
+    """Place name, "" if Mappls has none (or no key), None if the lookup failed."""
+    api_key = os.getenv("MAPPLS_API_KEY", "")
+    if not api_key:
+        return ""
+    try:
+        data = await http_client.get_json(
+            f"https://apis.mappls.com/advancedmaps/v1/{api_key}/rev_geocode",
+            params={"lat": lat, "lng": lng},
+            timeout=6,
+            raise_for_status=True,
+        )
+    except Exception as e:
+        return None if _transient(e) else ""
+    try:
+        results = data.get("results", [])
+        if results:
+            r = results[0]
+            parts = filter(None, [r.get("locality"), r.get("district"), r.get("state")])
+            return ", ".join(parts)
+    except (AttributeError, TypeError):
+        pass
+    return ""
@@ -0,0 +1,298 @@
+"""
+Geofencing of live driver positions against the accident hotspot clusters.
+
+``kmeans_hotspots.pkl`` clusters the training accidents in scaled
+coordinates. When the artifacts load, the cluster centres are mapped
+back to lat/lng (``coord_scaler.inverse_transform``) and rasterized into
+a tiled grid: each ``GEOFENCE_CELL_DEG`` cell holds the id of the
+nearest hotspot whose ``GEOFENCE_RADIUS_KM`` fence covers the cell
+centre, or -1. Only tiles a fence reaches are allocated, and the cells
+are coarsened if they would exceed ``GEOFENCE_MAX_CELLS``. Placing a
+position is then two multiplies, a dict lookup and one array read (no
+KMeans/scaler call per update), so a worker can keep up with tens of
+thousands of updates per second. The grid is registered as
+derived state, so it is rebuilt with every (hot) reload of the models.
+
+Per session the engine remembers which hotspot the driver is in. On
+entering one it pushes a ``zone_entry`` alert to that driver (at most
+once per hotspot per ``GEOFENCE_REENTRY_COOLDOWN`` seconds, so GPS
+jitter on a fence edge doesn't spam); exits only update state and
+metrics.
+"""
+
+import math
+import os
+import time
+
+import numpy as np
+
+from app.services.geo import KM_PER_DEG_LAT
+from app.services.metrics import metrics
+from app.services.model_registry import registry
+from app.services.websocket import build_alert, manager as ws_manager
+from app.services.zones import nearest_zone
+
+GEOFENCE_RADIUS_KM = float(os.getenv("GEOFENCE_RADIUS_KM", "0.75"))
+GEOFENCE_CELL_DEG = float(os.getenv("GEOFENCE_CELL_DEG", "0.0005"))  # ~55 m
+GEOFENCE_MAX_CELLS = int(os.getenv("GEOFENCE_MAX_CELLS", "8000000"))
+GEOFENCE_REENTRY_COOLDOWN = float(os.getenv("GEOFENCE_REENTRY_COOLDOWN", "600"))
+
+OUTSIDE = -1
+
+
+# --------------------------------------------------
+# Precomputed hotspot grid (derived from the registry bundle)
+# --------------------------------------------------
+GEOFENCE_TILE = 32  # cells per tile side (a power of two)
+_TILE_SHIFT = GEOFENCE_TILE.bit_length() - 1
+_TILE_MASK = GEOFENCE_TILE - 1
+
+
+class HotspotFence:
+    """
+    Cell → hotspot id grid, stored as ``GEOFENCE_TILE``² tiles that exist
+    only where some fence reaches, so memory follows the fenced area and
+    not the bounding box of all hotspots. If the tiles would still exceed
+    ``max_cells``, the cells are coarsened to fit.
+    """
+
+    def __init__(
+        self,
+        centers,
+        accidents,
+        radius_km: float = GEOFENCE_RADIUS_KM,
+        cell_deg: float = GEOFENCE_CELL_DEG,
+        max_cells: int = GEOFENCE_MAX_CELLS,
+    ):
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        self.centers = centers
+        self.accidents = np.asarray(accidents, dtype=np.int64)
+        self.radius_km = radius_km
+
+        # Severity by how many training accidents fell in the cluster
+        cutoff = np.percentile(self.accidents, 75) if len(self.accidents) else 0
+        self.severity = [
+            "critical" if n >= cutoff else "warning" for n in self.accidents
+        ]
+        self.names = [nearest_zone(lat, lng) for lat, lng in centers]
+        self.tiles: dict[tuple[int, int], np.ndarray] = {}
+
+        max_tiles = max(1, max_cells // GEOFENCE_TILE**2)
+        pad_lat = radius_km / KM_PER_DEG_LAT
+        if len(centers):
+            cos_lat = np.cos(np.radians(np.abs(centers[:, 0]).max() + pad_lat))
+        else:
+            cos_lat = 1.0
+        pad_lng = radius_km / (KM_PER_DEG_LAT * cos_lat)
+
+        # Coarsen the cells until the tiles the fences touch fit the budget
+        requested = cell_deg
+        while self._tiles_touched(centers, pad_lat, pad_lng, cell_deg) > max_tiles:
+            cell_deg *= 1.25
+        if cell_deg != requested:
+            print(
+                f"[WARN] Geofence cells coarsened from {requested:g} to "
+                f"{cell_deg:.5f} deg to stay under {max_cells} cells"
+            )
+        self.cell_deg = cell_deg
+        self.inv_cell = 1.0 / cell_deg
+
+        id_dtype = np.int16 if len(centers) < np.iinfo(np.int16).max else np.int32
+        best: dict[tuple[int, int], np.ndarray] = {}
+        shape = (GEOFENCE_TILE, GEOFENCE_TILE)
+
+        # Stamp each fence onto the cells of its bounding box, tile by tile;
+        # overlapping fences resolve to the nearer centre.
+        for cid, (c_lat, c_lng) in enumerate(centers):
+            r0 = math.floor((c_lat - pad_lat) * self.inv_cell)
+            r1 = math.floor((c_lat + pad_lat) * self.inv_cell) + 1
+            c0 = math.floor((c_lng - pad_lng) * self.inv_cell)
+            c1 = math.floor((c_lng + pad_lng) * self.inv_cell) + 1
+            lats = (np.arange(r0, r1) + 0.5) * cell_deg
+            lngs = (np.arange(c0, c1) + 0.5) * cell_deg
+            d_lat = (lats - c_lat)[:, None] * KM_PER_DEG_LAT
+            d_lng = (lngs - c_lng)[None, :] * KM_PER_DEG_LAT * np.cos(np.radians(c_lat))
+            dist = np.sqrt(d_lat * d_lat + d_lng * d_lng).astype(np.float32)
+            inside = dist <= radius_km
+
+            for tr in range(r0 >> _TILE_SHIFT, ((r1 - 1) >> _TILE_SHIFT) + 1):
+                tr0 = max(r0, tr << _TILE_SHIFT)
+                tr1 = min(r1, (tr + 1) << _TILE_SHIFT)
+                for tc in range(c0 >> _TILE_SHIFT, ((c1 - 1) >> _TILE_SHIFT) + 1):
+                    tc0 = max(c0, tc << _TILE_SHIFT)
+                    tc1 = min(c1, (tc + 1) << _TILE_SHIFT)
+                    d = dist[tr0 - r0 : tr1 - r0, tc0 - c0 : tc1 - c0]
+                    hit = inside[tr0 - r0 : tr1 - r0, tc0 - c0 : tc1 - c0]
+                    if not hit.any():
+                        continue
+                    key = (tr, tc)
+                    tile = self.tiles.get(key)
+                    if tile is None:
+                        tile = self.tiles[key] = np.full(shape, OUTSIDE, id_dtype)
+                        best[key] = np.full(shape, np.inf, dtype=np.float32)
+                    rows = slice(tr0 & _TILE_MASK, ((tr1 - 1) & _TILE_MASK) + 1)
+                    cols = slice(tc0 & _TILE_MASK, ((tc1 - 1) & _TILE_MASK) + 1)
+                    block = best[key][rows, cols]
+                    closer = hit & (d < block)
+                    block[closer] = d[closer]
+                    tile[rows, cols][closer] = cid
+
+    @staticmethod
+    def _tiles_touched(centers, pad_lat, pad_lng, cell_deg) -> int:
+        inv = 1.0 / (cell_deg * GEOFENCE_TILE)
+        touched = set()
+        for c_lat, c_lng in centers:
+            rows = range(
+                math.floor((c_lat - pad_lat) * inv),
+                math.floor((c_lat + pad_lat) * inv) + 1,
+            )
+            cols = range(
+                math.floor((c_lng - pad_lng) * inv),
+                math.floor((c_lng + pad_lng) * inv) + 1,
+            )
+            touched.update((r, c) for r in rows for c in cols)
+        return len(touched)
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.tiles) * GEOFENCE_TILE**2
+
+    @classmethod
+    def from_bundle(cls, bundle) -> "HotspotFence":
+        kmeans = bundle.kmeans
+        centers = bundle.coord_scaler.inverse_transform(kmeans.cluster_centers_)
+        labels = getattr(kmeans, "labels_", None)
+        if labels is not None:
+            accidents = np.bincount(labels, minlength=len(centers))
+        else:
+            accidents = np.zeros(len(centers), dtype=np.int64)
+        return cls(centers, accidents)
+
+    def locate(self, lat: float, lng: float) -> int:
+        """Hotspot id whose fence contains (lat, lng), or OUTSIDE."""
+        row = math.floor(lat * self.inv_cell)
+        col = math.floor(lng * self.inv_cell)
+        tile = self.tiles.get((row >> _TILE_SHIFT, col >> _TILE_SHIFT))
+        if tile is None:
+            return OUTSIDE
+        return int(tile[row & _TILE_MASK, col & _TILE_MASK])
+
+    def describe(self, cid: int) -> dict:
+        lat, lng = self.centers[cid]
+        return {
+            "hotspot_id": cid,
+            "name": self.names[cid],
+            "lat": round(float(lat), 5),
+            "lon": round(float(lng), 5),
+            "accidents": int(self.accidents[cid]),
+            "radius_km": self.radius_km,
+        }
+
+
+def _build_fence(bundle) -> HotspotFence:
+    started = time.perf_counter()
+    fence = HotspotFence.from_bundle(bundle)
+    print(
+        f"[OK] Hotspot geofence built: {len(fence.centers)} hotspots, "
+        f"{len(fence.tiles)} tiles ({fence.n_cells} cells) in {time.perf_counter() - started:.2f}s"
+    )
+    return fence
+
+
+registry.register_derived("hotspot_fence", _build_fence)
+
+
+# --------------------------------------------------
+# Per-session enter/exit tracking
+# --------------------------------------------------
+class _FenceState:
+    __slots__ = ("hotspot", "alerted")
+
+    def __init__(self):
+        self.hotspot = OUTSIDE
+        self.alerted: dict[int, float] = {}  # hotspot id → last entry alert
+
+
+class GeofenceEngine:
+    """Tracks which hotspot each connected driver is in."""
+
+    def __init__(self, cooldown: float = GEOFENCE_REENTRY_COOLDOWN):
+        self.cooldown = cooldown
+        self.sessions: dict[str, _FenceState] = {}
+        self._fence: HotspotFence | None = None
+        self.updates = 0
+        self.entries = 0
+        self.exits = 0
+
+    def fence(self) -> HotspotFence | None:
+        bundle = registry.get()
+        fence = bundle.derived("hotspot_fence") if bundle is not None else None
+        if fence is not self._fence:
+            # Retrained clusters: old hotspot ids no longer mean anything
+            self._fence = fence
+            self.sessions.clear()
+        return fence
+
+    def update(self, session_id: str, lat: float, lng: float) -> dict | None:
+        """Record a position; returns the zone_entry alert if one was sent."""
+        fence = self.fence()
+        if fence is None:
+            return None
+        self.updates += 1
+        hotspot = fence.locate(lat, lng)
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = _FenceState()
+        previous = state.hotspot
+        if hotspot == previous:
+            return None
+
+        state.hotspot = hotspot
+        if previous != OUTSIDE:
+            self.exits += 1
+        if hotspot == OUTSIDE:
+            return None
+        self.entries += 1
+        now = time.monotonic()
+        if now - state.alerted.get(hotspot, -self.cooldown) < self.cooldown:
+            return None
+        state.alerted[hotspot] = now
+        alert = self._entry_alert(fence, hotspot)
+        ws_manager.notify(session_id, alert)
+        metrics.incr("geofence.alerts")
+        return alert
+
+    def forget(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+    @staticmethod
+    def _entry_alert(fence: HotspotFence, hotspot: int) -> dict:
+        info = fence.describe(hotspot)
+        return build_alert(
+            alert_type="zone_entry",
+            message=(
+                f"⚠️ Entering accident hotspot near {info['name']} — "
+                f"{info['accidents']} past accidents recorded here. Drive carefully."
+            ),
+            severity=fence.severity[hotspot],
+            zone=info["name"],
+            data=info,
+        )
+
+    def stats(self) -> dict:
+        fence = self._fence
+        return {
+            "sessions": len(self.sessions),
+            "inside": sum(1 for s in self.sessions.values() if s.hotspot != OUTSIDE),
+            "updates": self.updates,
+            "entries": self.entries,
+            "exits": self.exits,
+            "hotspots": len(fence.centers) if fence is not None else 0,
+        }
+
+
+# Singleton instance, fed by the alerts socket
+engine = GeofenceEngine()
+ws_manager.add_position_listener(engine.update)
+ws_manager.add_disconnect_listener(engine.forget)
+metrics.register_gauge("geofence", engine.stats)
@@ -0,0 +1,101 @@
+"""
+Shared async HTTP client for every outbound provider call
+(Nominatim, OSRM, Mappls, OpenWeatherMap).
+
+- One pooled ``httpx.AsyncClient`` per upstream host, so keep-alive
+  connections are reused and a slow provider can only exhaust its own
+  pool, never the others'.
+- Timeouts and retries are configurable via environment variables;
+  transport errors, 429s and 5xx responses are retried with exponential
+  backoff.
+- Everything is non-blocking, so a worker can keep hundreds of route
+  analyses in flight on one event loop.
+"""
+
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.services.metrics import metrics
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.25"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "50"))
+HTTP_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_KEEPALIVE_PER_HOST", "20"))
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (event loop, scheme://host) → client. Clients are bound to the loop that
+# created them, so a new loop (e.g. in a script) gets fresh pools.
+_clients: dict[tuple[int, str], httpx.AsyncClient] = {}
+
+
+def _client_for(url: str) -> httpx.AsyncClient:
+    parts = urlsplit(url)
+    key = (id(asyncio.get_running_loop()), f"{parts.scheme}://{parts.netloc}")
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=HTTP_KEEPALIVE_PER_HOST,
+            ),
+            follow_redirects=True,
+        )
+        _clients[key] = client
+    return client
+
+
+async def get_json(
+    url: str,
+    params: dict | None = None,
+    headers: dict | None = None,
+    timeout: float | None = None,
+    retries: int | None = None,
+    raise_for_status: bool = False,
+):
+    """
+    GET ``url`` and decode the JSON body.
+
+    Retries transport errors and retryable statuses up to ``retries``
+    times (default ``HTTP_RETRIES``). With ``raise_for_status`` any
+    remaining 4xx/5xx raises ``httpx.HTTPStatusError``; otherwise the body
+    is returned as-is so callers can read provider error payloads.
+    """
+    client = _client_for(url)
+    host = urlsplit(url).hostname
+    attempts = 1 + (HTTP_RETRIES if retries is None else retries)
+    kwargs = {"params": params, "headers": headers}
+    if timeout is not None:
+        kwargs["timeout"] = httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT)
+
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(url, **kwargs)
+        except httpx.TransportError:
+            metrics.incr(f"http.{host}.errors")
+            if last:
+                raise
+        else:
+            metrics.observe(f"http.{host}", time.perf_counter() - started)
+            if response.status_code not in _RETRY_STATUSES or last:
+                if raise_for_status:
+                    response.raise_for_status()
+                return response.json()
+        metrics.incr(f"http.{host}.retries")
+        await asyncio.sleep(HTTP_RETRY_BACKOFF * (2**attempt))
+
+
+async def aclose():
+    """Close every pooled client (called on application shutdown)."""
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
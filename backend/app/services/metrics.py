@@ -0,0 +1,115 @@
+"""
+In-process metrics for the service, exposed at ``GET /api/metrics``.
+
+- Counters: ``metrics.incr("singleflight.osrm.shared")``
+- Timers: ``metrics.observe("http.nominatim.openstreetmap.org", seconds)``
+  keep count / total / max plus a window of recent samples for
+  percentiles.
+- Gauges: ``metrics.register_gauge("cache.geocode_forward", fn)`` — ``fn``
+  is called at snapshot time (e.g. cache sizes and hit counts).
+
+Values are per worker process.
+"""
+
+import threading
+import time
+from collections import deque
+
+TIMER_WINDOW = 1024  # recent samples kept per timer for percentiles
+
+
+class _Timer:
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=TIMER_WINDOW)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.recent)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 6)
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": pct(0.50) if ordered else 0.0,
+            "p95": pct(0.95) if ordered else 0.0,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self._timers: dict[str, _Timer] = {}
+        self._gauges: dict = {}
+        self.started_at = time.time()
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = _Timer()
+            timer.add(seconds)
+
+    def timed(self, name: str):
+        """Context manager that observes the elapsed time under ``name``."""
+        return _Timed(self, name)
+
+    def register_gauge(self, name: str, fn):
+        self._gauges[name] = fn
+
+    def counter(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(sorted(self._counters.items()))
+            timers = {k: t.summary() for k, t in sorted(self._timers.items())}
+        gauges = {}
+        for name, fn in sorted(self._gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception as e:
+                gauges[name] = {"error": str(e)}
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "counters": counters,
+            "timers": timers,
+            "gauges": gauges,
+        }
+
+
+class _Timed:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+# Singleton instance
+metrics = Metrics()
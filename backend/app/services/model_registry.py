@@ -0,0 +1,271 @@
+"""
+Shared registry for the ML artifacts written by ``ML/train.py``.
+
+Every module that needs the severity model, encoders, scaler or hotspot
+clusters goes through the single ``registry`` instance, so each worker
+holds one copy of the forest.
+
+- Lazy: nothing is read until the first ``get()`` (or ``prewarm()``).
+  On an event loop thread ``get()`` never loads inline: it returns None
+  ("not ready") and starts the load in the background, so the first
+  request after startup cannot freeze every other connection.
+- Hot reload: ``get()`` re-stats the artifacts at most every
+  ``MODEL_RELOAD_INTERVAL`` seconds. Once a retrain has finished writing
+  (files untouched for ``MODEL_RELOAD_SETTLE`` seconds) a background
+  thread loads the new set and swaps it in with one reference
+  assignment, so requests always see a complete, consistent bundle.
+- Derived state: other modules can register builders (e.g. the risk
+  lookup table) that run as part of each load and are swapped in with it.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+
+MODEL_DIR = Path(__file__).resolve().parent.parent / "models"
+RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "5"))
+RELOAD_SETTLE = float(os.getenv("MODEL_RELOAD_SETTLE", "2"))
+
+# attribute name → artifact file (feature_config is optional)
+REQUIRED_ARTIFACTS = {
+    "model": "severity_model.pkl",
+    "encoders": "encoders.pkl",
+    "severity_encoder": "severity_encoder.pkl",
+    "coord_scaler": "coord_scaler.pkl",
+    "kmeans": "kmeans_hotspots.pkl",
+}
+OPTIONAL_ARTIFACTS = {
+    "feature_config": "feature_config.pkl",
+}
+
+
+class ModelBundle:
+    """One consistent, immutable set of loaded artifacts."""
+
+    def __init__(self, artifacts: dict, version: str, signature, load_seconds: float):
+        self.model = artifacts["model"]
+        self.encoders = artifacts["encoders"]
+        self.severity_encoder = artifacts["severity_encoder"]
+        self.coord_scaler = artifacts["coord_scaler"]
+        self.kmeans = artifacts["kmeans"]
+        self.feature_config = artifacts.get("feature_config")
+        self.version = version
+        self.signature = signature
+        self.loaded_at = datetime.now().isoformat()
+        self.load_seconds = load_seconds
+        self._derived: dict = {}
+        self.derived_errors: dict[str, str] = {}
+        self._derived_lock = threading.Lock()
+
+    def derived(self, name: str):
+        """
+        Value of a registered derived builder for this bundle, or None if
+        the builder failed (callers fall back to the non-derived path).
+        """
+        value = self._derived.get(name)
+        if value is None and name in _derived_builders:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None and name not in self.derived_errors:
+                    value = self._build(name)
+        return value
+
+    def _build(self, name: str):
+        """Run one builder; a failure is logged and not retried for this bundle."""
+        try:
+            value = _derived_builders[name](self)
+        except Exception as e:
+            self.derived_errors[name] = str(e)
+            print(f"[WARN] Derived state '{name}' failed to build, skipping it: {e}")
+            return None
+        self._derived[name] = value
+        return value
+
+
+_derived_builders: dict = {}
+
+
+class ModelRegistry:
+    """Loads, caches and hot-reloads the artifacts in ``model_dir``."""
+
+    def __init__(self, model_dir: Path = MODEL_DIR):
+        self.model_dir = Path(model_dir)
+        self._bundle: ModelBundle | None = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = 0.0
+        self._failed_signature = None
+        self.last_error: str | None = None
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self) -> ModelBundle | None:
+        """
+        The current bundle (loading it on first use), or None if unavailable.
+        Called from the event loop before the first load it returns None at
+        once and loads on a background thread instead.
+        """
+        bundle = self._bundle
+        if bundle is None:
+            if _on_event_loop():
+                now = time.monotonic()
+                if now - self._last_check >= RELOAD_INTERVAL:
+                    self._last_check = now
+                    self._maybe_reload_async()
+                return None
+            with self._lock:
+                if self._bundle is None:
+                    self._load()
+                return self._bundle
+
+        now = time.monotonic()
+        if now - self._last_check >= RELOAD_INTERVAL:
+            self._last_check = now
+            self._maybe_reload_async()
+        return bundle
+
+    def prewarm(self) -> threading.Thread:
+        """Load the artifacts (and derived state) on a background thread."""
+
+        def _warm():
+            bundle = self.get()
+            if bundle is not None:
+                for name in list(_derived_builders):
+                    bundle.derived(name)
+
+        thread = threading.Thread(target=_warm, name="model-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def reload(self) -> bool:
+        """Synchronously load the artifacts on disk; True if a new set was swapped in."""
+        with self._lock:
+            before = self._bundle
+            self._load()
+            return self._bundle is not before
+
+    def register_derived(self, name: str, builder):
+        """
+        Attach ``builder(bundle)`` as derived state. It runs as part of every
+        load (and lazily for a bundle loaded before registration).
+        """
+        _derived_builders[name] = builder
+
+    def status(self) -> dict:
+        bundle = self._bundle
+        return {
+            "model_loaded": bundle is not None,
+            "model_version": bundle.version if bundle else None,
+            "model_loaded_at": bundle.loaded_at if bundle else None,
+            "model_load_seconds": round(bundle.load_seconds, 3) if bundle else None,
+            "model_error": self.last_error,
+            "derived_errors": dict(bundle.derived_errors) if bundle else {},
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _signature(self):
+        names = [*REQUIRED_ARTIFACTS.values(), *OPTIONAL_ARTIFACTS.values()]
+        sig = []
+        for name in names:
+            try:
+                st = os.stat(self.model_dir / name)
+                sig.append((name, st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((name, None, None))
+        return tuple(sig)
+
+    def _maybe_reload_async(self):
+        """Start a background load if the artifacts changed since the last one."""
+        bundle = self._bundle
+        if self._reloading:
+            return
+        signature = self._signature()
+        if bundle is not None and signature == bundle.signature:
+            return
+        if signature == self._failed_signature:
+            return  # same broken / missing files as last attempt
+        # Wait until train.py has finished writing every file
+        newest = max((m for _, m, _ in signature if m is not None), default=0)
+        if time.time() - newest / 1e9 < RELOAD_SETTLE:
+            self._last_check = 0.0  # look again on the next request
+            return
+
+        self._reloading = True
+
+        def _reload():
+            try:
+                self.reload()
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=_reload, name="model-reload", daemon=True).start()
+
+    def _load(self):
+        """Load every artifact and swap the bundle in. Caller holds ``_lock``."""
+        signature = self._signature()
+        if self._bundle is not None and signature == self._bundle.signature:
+            return
+        if signature == self._failed_signature:
+            return  # same broken / missing files as last attempt
+        started = time.perf_counter()
+        try:
+            artifacts = {}
+            digest = hashlib.sha256()
+            for attr, name in {**REQUIRED_ARTIFACTS, **OPTIONAL_ARTIFACTS}.items():
+                path = self.model_dir / name
+                if attr in OPTIONAL_ARTIFACTS and not path.exists():
+                    continue
+                with open(path, "rb") as fh:
+                    digest.update(fh.read())
+                artifacts[attr] = joblib.load(path)
+
+            bundle = ModelBundle(
+                artifacts,
+                version=digest.hexdigest()[:12],
+                signature=signature,
+                load_seconds=0.0,
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            self._failed_signature = signature
+            if self._bundle is None:
+                print(
+                    f"[WARN] ML model files not found. Run train.py first. Error: {e}"
+                )
+            else:
+                print(f"[WARN] ML model reload failed, keeping current models: {e}")
+            return
+
+        # Derived state is optional: a builder that fails only loses its
+        # fast path, never the model version itself
+        for name in list(_derived_builders):
+            bundle._build(name)
+
+        bundle.load_seconds = time.perf_counter() - started
+        self.last_error = None
+        self._bundle = bundle
+        print(
+            f"[OK] ML models loaded (version {bundle.version}) "
+            f"in {bundle.load_seconds:.2f}s."
+        )
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# Singleton instance
+registry = ModelRegistry()
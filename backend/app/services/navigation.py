@@ -1,39 +1,21 @@
 import os
-import requests
 import numpy as np
-import joblib
 from datetime import datetime
 import polyline
 from dotenv import load_dotenv
 
+from app.services import http_client
+from app.services.risk_table import risk_proba
+from app.services.singleflight import SingleFlight
+from app.services.weather import (
+    get_road_condition_from_weather,
+    sample_route_weather,
+    summarize_route_weather,
+)
+
 # Load Environment Variables
 load_dotenv()
 
-# -------------------------------
-# Load Saved ML Artifacts
-# -------------------------------
-# Using relative paths or absolute paths as per your project structure
-BASE_PATH = os.path.dirname(os.path.dirname(__file__))  # Pointing to backend/app
-MODEL_DIR = os.path.join(BASE_PATH, "models")
-
-model = None
-encoders = None
-severity_encoder = None
-coord_scaler = None
-kmeans = None
-
-try:
-    model = joblib.load(os.path.join(MODEL_DIR, "severity_model.pkl"))
-    encoders = joblib.load(os.path.join(MODEL_DIR, "encoders.pkl"))
-    severity_encoder = joblib.load(os.path.join(MODEL_DIR, "severity_encoder.pkl"))
-    coord_scaler = joblib.load(os.path.join(MODEL_DIR, "coord_scaler.pkl"))
-    kmeans = joblib.load(os.path.join(MODEL_DIR, "kmeans_hotspots.pkl"))
-    print("[OK] Navigation ML models loaded successfully.")
-except Exception as e:
-    print(
-        f"[WARN] Navigation ML models not found: {e}. Navigation risk scoring unavailable."
-    )
-
 MAPPLS_API_KEY = os.getenv("MAPPLS_API_KEY")
 if not MAPPLS_API_KEY:
     print(
@@ -41,112 +23,26 @@ if not MAPPLS_API_KEY:
         "Add it to your backend/.env file. Get a free key from https://apis.mappls.com/"
     )
 
+
 # --------------------------------------------------
-# Feature Engineering for ML Prediction
-# (must match train.py's 15-feature FEATURES list)
+# ML risk scoring (see risk_table.risk_proba)
 # --------------------------------------------------
-_ROAD_RISK = {
-    "Slippery": 4,
-    "Potholed": 3,
-    "Under Construction": 3,
-    "Wet": 2,
-    "Dry": 1,
-    "Good": 1,
-}
-_TIME_RISK = {
-    "Late Night": 3,
-    "Night": 2,
-    "Morning Rush": 2,
-    "Evening Rush": 2,
-    "Afternoon": 1,
-    "Midday": 1,
-}
-_WEATHER_SEV = {
-    "Clear": 1,
-    "Cloudy": 1,
-    "Rainy": 3,
-    "Foggy": 2,
-    "Stormy": 4,
-    "Hail": 4,
-    "Snowy": 3,
-}
-
-
-def _safe_enc(key, value):
-    try:
-        return int(encoders[key].transform([value])[0])
-    except (ValueError, KeyError):
-        return 0
-
-
-def _time_bin(hour):
-    if 6 <= hour < 10:
-        return "Morning Rush"
-    if 10 <= hour < 12:
-        return "Midday"
-    if 12 <= hour < 16:
-        return "Afternoon"
-    if 16 <= hour < 20:
-        return "Evening Rush"
-    if 20 <= hour < 23:
-        return "Night"
-    return "Late Night"
-
-
-def _day_night(hour):
-    return "Nighttime" if hour >= 20 or hour < 6 else "Daytime"
-
-
-def prepare_features(lat, lon, city, weather="Clear", road_condition="Dry"):
-    """Builds a 15-feature vector matching train.py's FEATURES order."""
-    now = datetime.now()
-    hour = now.hour
-    tb = _time_bin(hour)
-    dn = _day_night(hour)
-
-    weather_enc = _safe_enc("Weather", weather)
-    road_enc = _safe_enc("Road_Condition", road_condition)
-    time_bin_enc = _safe_enc("Time_Bin", tb)
-    day_night_enc = _safe_enc("Day_Night", dn)
-
-    weather_sev = _WEATHER_SEV.get(weather, 2)
-    traffic_dens = 5  # medium — unknown at prediction time
-    road_risk_n = _ROAD_RISK.get(road_condition, 2)
-    time_risk_n = _TIME_RISK.get(tb, 1)
-    is_night = 1 if dn == "Nighttime" else 0
-    w_road_risk = weather_sev * road_risk_n
-
-    # Casualty fields = 0 at inference (they're outcomes, not inputs)
-    return [
-        [
-            weather_enc,
-            road_enc,
-            time_bin_enc,
-            day_night_enc,
-            weather_sev,
-            traffic_dens,
-            road_risk_n,
-            time_risk_n,
-            is_night,
-            w_road_risk,
-            0,
-            0,  # casualty_severity_idx, total_casualties
-            0,
-            0,
-            0,  # fatalities, serious_injuries, minor_injuries
-        ]
-    ]
-
-
-def predict_risk(lat, lon, city):
-    features = prepare_features(lat, lon, city)
-    proba = model.predict_proba(features)[0]
-
-    try:
-        high_index = list(severity_encoder.classes_).index("High")
-        return float(proba[high_index])
-    except ValueError:
-        return 0.5
+def predict_risk_batch(points, city, weathers=None, road_conditions=None):
+    """
+    High-severity probability for many (lat, lon) points, optionally with
+    the weather / road condition observed at each point.
+    """
+    if not points:
+        return np.empty(0)
+    hour = datetime.now().hour
+    n = len(points)
+    weathers = weathers or ["Clear"] * n
+    road_conditions = road_conditions or ["Dry"] * n
+    scored = risk_proba(weathers, road_conditions, [hour] * n)
+    if scored is None:
+        raise RuntimeError("Navigation risk scoring unavailable: models not loaded")
+    proba, table = scored
+    return table.high_probability(proba).astype(float)
 
 
 # --------------------------------------------------
@@ -154,24 +50,35 @@ def predict_risk(lat, lon, city):
 # --------------------------------------------------
 
 
-def calculate_route_risk(polyline_str, city):
+def _sample_route(polyline_str):
     # Mappls uses standard polyline encoding
     coordinates = polyline.decode(polyline_str)
 
     # Performance optimization: sample points to avoid lag
     # Longer routes = sparser sampling
     sample_interval = max(1, len(coordinates) // 20)
-    sampled_coords = coordinates[::sample_interval]
-
-    risks = []
-    for lat, lon in sampled_coords:
-        risk = predict_risk(lat, lon, city)
-        risks.append(risk)
-
-    if not risks:
-        return 1.0  # Max risk if no data
-
-    return float(np.mean(risks))
+    return coordinates[::sample_interval]
+
+
+def score_route_samples(samples, city, weathers=None):
+    """
+    Average risk for several already-sampled routes, scoring every point
+    of every route with a single ``risk_proba`` call and splitting the
+    results back per route. ``weathers`` optionally gives the Suraksha
+    weather condition at each sampled point (all routes, in order); the
+    road condition is derived from it.
+    """
+    roads = [get_road_condition_from_weather(w) for w in weathers] if weathers else None
+    risks = predict_risk_batch([pt for s in samples for pt in s], city, weathers, roads)
+
+    averages = []
+    offset = 0
+    for s in samples:
+        route_risks = risks[offset : offset + len(s)]
+        offset += len(s)
+        # Max risk if no data
+        averages.append(float(np.mean(route_risks)) if len(s) else 1.0)
+    return averages
 
 
 # --------------------------------------------------
@@ -179,29 +86,53 @@ def calculate_route_risk(polyline_str, city):
 # --------------------------------------------------
 
 
-def get_safer_route(origin_lat, origin_lon, dest_lat, dest_lon, city):
+MAPPLS_ROUTE_TIMEOUT = float(os.getenv("MAPPLS_ROUTE_TIMEOUT", "15"))
+_route_flight = SingleFlight("mappls_route")
+
+
+async def get_safer_route(origin_lat, origin_lon, dest_lat, dest_lon, city):
+    # Identical concurrent requests share one Mappls call and one scoring pass
+    key = (
+        *(round(float(c), 5) for c in (origin_lat, origin_lon, dest_lat, dest_lon)),
+        city,
+    )
+    return await _route_flight.do(
+        key, _get_safer_route, origin_lat, origin_lon, dest_lat, dest_lon, city
+    )
+
+
+async def _get_safer_route(origin_lat, origin_lon, dest_lat, dest_lon, city):
     # Mappls Advanced Routing URL
     url = f"https://apis.mappls.com/advancedmaps/v1/{MAPPLS_API_KEY}/route_adv/driving/{origin_lon},{origin_lat};{dest_lon},{dest_lat}"
 
     params = {"alternatives": "true", "overview": "full", "geometries": "polyline"}
 
-    response = requests.get(url, params=params)
-    data = response.json()
+    data = await http_client.get_json(url, params=params, timeout=MAPPLS_ROUTE_TIMEOUT)
 
     if "routes" not in data or not data["routes"]:
         raise Exception(
             f"Mappls API Error: {data.get('error_description', 'No routes found')}"
         )
 
-    routes = data["routes"]
+    routes = [r for r in data["routes"] if r.get("geometry", "")]
     route_scores = []
 
-    for route in routes:
-        polyline_str = route.get("geometry", "")
-        if not polyline_str:
-            continue
+    # Weather along every alternative (shared ~1 km cells fetched once,
+    # capped per request), fed into each point's risk features
+    samples = [_sample_route(r["geometry"]) for r in routes]
+    sampled_weather = await sample_route_weather([pt for s in samples for pt in s])
+    conditions = [w["condition"] if w else "Clear" for w in sampled_weather]
 
-        avg_risk = calculate_route_risk(polyline_str, city)
+    # Score all alternatives together — one forest invocation per request
+    route_risks = score_route_samples(samples, city, weathers=conditions)
+
+    offset = 0
+    for route, avg_risk, sample in zip(routes, route_risks, samples):
+        route_weather = summarize_route_weather(
+            sampled_weather[offset : offset + len(sample)]
+        )
+        offset += len(sample)
+        polyline_str = route["geometry"]
 
         # ── Distance & Duration ─────────────────────────────────────────────
         legs = route.get("legs", [])
@@ -318,6 +249,7 @@ def get_safer_route(origin_lat, origin_lon, dest_lat, dest_lon, city):
                 "route_geometry": decoded_geometry,
                 "traffic_info": traffic_info,
                 "is_peak_hour": is_peak_hour,
+                "weather": route_weather,
             }
         )
 
@@ -0,0 +1,149 @@
+"""
+Dependency-aware stage graph for request pipelines.
+
+A ``StageGraph`` is a set of named ``Stage``s, each an async (or, with
+``blocking=True``, a plain CPU-bound) function whose keyword arguments
+are the results of the stages — or graph inputs — it depends on. Every
+stage starts as soon as its dependencies are done, so independent
+stages (e.g. geocoding both route endpoints, or fetching weather while
+OSRM routes) overlap and a request takes roughly as long as its
+longest dependency chain rather than the sum of its calls.
+
+Per stage:
+- ``timeout``: seconds before the stage is abandoned.
+- ``fallback``: value (or ``fn(**deps)``) used when the stage times out
+  or raises. Stages without one are required: their error cancels the
+  rest of the graph and propagates (a timeout as ``StageTimeout``).
+
+Stage durations, timeouts and fallbacks are reported to ``metrics``
+under ``stage.<graph>.<stage>``.
+"""
+
+import asyncio
+import time
+
+from app.services.metrics import metrics
+
+_REQUIRED = object()
+
+
+class StageTimeout(asyncio.TimeoutError):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"stage '{stage}' timed out after {timeout:g}s")
+        self.stage = stage
+
+
+class StageResults(dict):
+    """``{stage_name: result}``; ``fallbacks`` names the stages that fell back."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fallbacks: set[str] = set()
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        fn,
+        deps: tuple = (),
+        timeout: float | None = None,
+        fallback=_REQUIRED,
+        blocking: bool = False,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+        self.blocking = blocking
+
+    @property
+    def required(self) -> bool:
+        return self.fallback is _REQUIRED
+
+
+class StageGraph:
+    def __init__(self, name: str, stages: list[Stage], inputs: tuple = ()):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.stages = {s.name: s for s in stages}
+        self._check(stages)
+
+    def _check(self, stages):
+        known = set(self.inputs)
+        pending = list(stages)
+        # Kahn-style pass: every stage must be reachable from the inputs
+        while pending:
+            ready = [s for s in pending if all(d in known for d in s.deps)]
+            if not ready:
+                names = ", ".join(s.name for s in pending)
+                raise ValueError(f"{self.name}: unknown or cyclic deps in {names}")
+            for s in ready:
+                known.add(s.name)
+                pending.remove(s)
+
+    async def run(self, **inputs) -> dict:
+        """Run every stage; returns ``StageResults`` (inputs included)."""
+        missing = set(self.inputs) - set(inputs)
+        if missing:
+            raise TypeError(f"{self.name}: missing inputs {sorted(missing)}")
+
+        results = StageResults(inputs)
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage):
+            for dep in stage.deps:
+                if dep in tasks:
+                    await tasks[dep]
+            kwargs = {d: results[d] for d in stage.deps}
+            results[stage.name] = await self._execute(stage, kwargs, results)
+
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # Let cancelled stages unwind before the error propagates
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return results
+
+    async def _execute(self, stage: Stage, kwargs: dict, results: "StageResults"):
+        metric = f"stage.{self.name}.{stage.name}"
+        started = time.perf_counter()
+        try:
+            if stage.blocking:
+                call = asyncio.to_thread(stage.fn, **kwargs)
+            else:
+                call = stage.fn(**kwargs)
+            if stage.timeout is not None:
+                return await asyncio.wait_for(call, stage.timeout)
+            return await call
+        except asyncio.TimeoutError as e:
+            metrics.incr(f"{metric}.timeout")
+            if stage.required:
+                raise StageTimeout(stage.name, stage.timeout) from e
+            results.fallbacks.add(stage.name)
+            return self._fallback(stage, kwargs, metric)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if stage.required:
+                raise
+            print(
+                f"[WARN] {self.name}: stage '{stage.name}' failed, using fallback: {e}"
+            )
+            results.fallbacks.add(stage.name)
+            return self._fallback(stage, kwargs, metric)
+        finally:
+            metrics.observe(metric, time.perf_counter() - started)
+
+    @staticmethod
+    def _fallback(stage: Stage, kwargs: dict, metric: str):
+        metrics.incr(f"{metric}.fallback")
+        if callable(stage.fallback):
+            return stage.fallback(**kwargs)
+        return stage.fallback
@@ -0,0 +1,95 @@
+"""
+Live index of connected drivers' last reported positions.
+
+Fed by ``position`` messages on the alerts socket. Sessions are bucketed
+into ``POSITION_CELL_DEG`` grid cells (a dict of sets, updated in place
+as drivers move), so "drivers within R km of this SOS" only looks at the
+sessions in the cells overlapping the circle: the cost follows local
+driver density, not the total number of connections. Positions older
+than ``DRIVER_POSITION_TTL`` seconds are ignored by queries.
+"""
+
+import math
+import os
+import time
+
+from app.services.geo import EARTH_RADIUS_KM, KM_PER_DEG_LAT
+
+POSITION_CELL_DEG = float(os.getenv("POSITION_CELL_DEG", "0.02"))  # ~2.2 km
+DRIVER_POSITION_TTL = float(os.getenv("DRIVER_POSITION_TTL", "900"))
+
+
+class PositionIndex:
+    def __init__(
+        self, cell_deg: float = POSITION_CELL_DEG, ttl: float = DRIVER_POSITION_TTL
+    ):
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        # session_id → (lat, lng, cell, monotonic time of the report)
+        self._positions: dict[str, tuple[float, float, tuple, float]] = {}
+        self._cells: dict[tuple[int, int], set[str]] = {}
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def update(self, session_id: str, lat: float, lng: float):
+        cell = self._cell(lat, lng)
+        previous = self._positions.get(session_id)
+        if previous is None or previous[2] != cell:
+            if previous is not None:
+                self._leave(session_id, previous[2])
+            self._cells.setdefault(cell, set()).add(session_id)
+        self._positions[session_id] = (lat, lng, cell, time.monotonic())
+
+    def remove(self, session_id: str):
+        previous = self._positions.pop(session_id, None)
+        if previous is not None:
+            self._leave(session_id, previous[2])
+
+    def _leave(self, session_id: str, cell):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(session_id)
+            if not members:
+                del self._cells[cell]
+
+    def get(self, session_id: str):
+        """``(lat, lng)`` last reported by the session, or None."""
+        entry = self._positions.get(session_id)
+        return None if entry is None else entry[:2]
+
+    def within(self, lat: float, lng: float, km: float) -> list[tuple[str, float]]:
+        """``(session_id, distance_km)`` for fresh positions within ``km``."""
+        pad_lat = km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(lat) + pad_lat))), 1e-6)
+        pad_lng = pad_lat / cos_lat
+        r0, c0 = self._cell(lat - pad_lat, lng - pad_lng)
+        r1, c1 = self._cell(lat + pad_lat, lng + pad_lng)
+        fresh_after = time.monotonic() - self.ttl
+        phi1 = math.radians(lat)
+        cos_phi1 = math.cos(phi1)
+        found = []
+        for row in range(r0, r1 + 1):
+            for col in range(c0, c1 + 1):
+                for sid in self._cells.get((row, col), ()):
+                    p_lat, p_lng, _, seen = self._positions[sid]
+                    if seen < fresh_after:
+                        continue
+                    # Haversine (scalar; numpy per point would be slower here)
+                    phi2 = math.radians(p_lat)
+                    a = (
+                        math.sin((phi2 - phi1) / 2) ** 2
+                        + cos_phi1
+                        * math.cos(phi2)
+                        * math.sin(math.radians(p_lng - lng) / 2) ** 2
+                    )
+                    d = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+                    if d <= km:
+                        found.append((sid, d))
+        return found
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def stats(self) -> dict:
+        return {"located": len(self._positions), "cells": len(self._cells)}
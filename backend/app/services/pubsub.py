@@ -0,0 +1,302 @@
+"""
+Pub/sub transport for alert fan-out across worker processes.
+
+Each worker owns its own WebSockets, so an SOS or admin broadcast
+handled by one worker must reach the drivers held by all the others.
+``ConnectionManager`` delivers to its local sockets immediately and
+publishes the alert on a broker; every other worker receives it and fans
+it out to *its* sockets. Messages carry the publishing worker's id so a
+worker skips its own echo.
+
+Backends (``PUBSUB_BACKEND``):
+- ``local`` (default): in-process only — a single worker needs nothing.
+- ``redis``: Redis PUB/SUB at ``PUBSUB_URL`` (needs the optional
+  ``redis`` package).
+- ``tcp``: a tiny newline-delimited relay (``python -m
+  app.services.pubsub --port 8765``) at ``PUBSUB_URL=tcp://host:port``.
+  It is the stand-in broker for development, tests and benchmarks, and
+  is enough for a handful of workers on one host.
+
+Delivery is best effort, like the WebSockets themselves: while the
+broker is unreachable the local fan-out still works, remote publishes
+are dropped (``pubsub.dropped``) and the client keeps reconnecting.
+"""
+
+import argparse
+import asyncio
+import os
+import uuid
+from urllib.parse import urlparse
+
+from app.services.metrics import metrics
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")  # local | redis | tcp
+PUBSUB_URL = os.getenv("PUBSUB_URL", "")
+PUBSUB_CHANNEL = os.getenv("PUBSUB_CHANNEL", "suraksha:alerts")
+PUBSUB_RECONNECT = float(os.getenv("PUBSUB_RECONNECT", "1"))
+# Relay: drop a subscriber whose unsent backlog exceeds this many bytes
+PUBSUB_RELAY_MAX_BUFFER = int(os.getenv("PUBSUB_RELAY_MAX_BUFFER", str(4 << 20)))
+# Longest message line the tcp client and relay accept (asyncio's default is 64 KiB)
+PUBSUB_MAX_LINE = int(os.getenv("PUBSUB_MAX_LINE", str(1 << 20)))
+
+# Identifies this process in published messages (to skip our own echo)
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes | None:
+    """
+    Next newline-terminated message (b"" at EOF). A line longer than the
+    stream limit is read past and dropped (returns None), so the stream
+    stays in sync instead of failing.
+    """
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial  # EOF, possibly after an unterminated last line
+    except asyncio.LimitOverrunError as e:
+        consumed = e.consumed
+    metrics.incr("pubsub.oversize")
+    while True:
+        try:
+            await reader.readexactly(consumed)
+            await reader.readuntil(b"\n")
+            return None
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+        except asyncio.IncompleteReadError:
+            return b""  # EOF inside the oversized line
+
+
+def _deliver(handler, message: str):
+    """Hand one message to the handler; a failure drops only that message."""
+    try:
+        handler(message)
+    except Exception as e:
+        metrics.incr("pubsub.handler_errors")
+        print(f"[WARN] Pub/sub handler failed, dropping message: {e}")
+
+
+class LocalBroker:
+    """In-process broker: nothing crosses the process boundary."""
+
+    name = "local"
+
+    def __init__(self):
+        self._handler = None
+
+    async def start(self, handler):
+        self._handler = handler
+
+    async def publish(self, message: str):
+        # Every subscriber lives in this process and has already been served
+        metrics.incr("pubsub.published")
+
+    async def close(self):
+        self._handler = None
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "connected": True}
+
+
+class TcpBroker:
+    """Client of the newline-delimited relay (see ``serve_relay``)."""
+
+    name = "tcp"
+
+    def __init__(self, url: str):
+        parsed = urlparse(url if "://" in url else f"tcp://{url}")
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 8765
+        self._handler = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+        self._connected = asyncio.Event()
+
+    async def start(self, handler):
+        self._handler = handler
+        self._task = asyncio.create_task(self._run())
+        try:
+            # Give the first connection a moment so early publishes aren't lost
+            await asyncio.wait_for(self._connected.wait(), PUBSUB_RECONNECT)
+        except asyncio.TimeoutError:
+            print(f"[WARN] Pub/sub relay {self.host}:{self.port} not reachable yet")
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    self.host, self.port, limit=PUBSUB_MAX_LINE
+                )
+            except OSError:
+                await asyncio.sleep(PUBSUB_RECONNECT)
+                continue
+            self._writer = writer
+            self._connected.set()
+            print(f"[OK] Pub/sub connected to tcp://{self.host}:{self.port}")
+            try:
+                while (line := await _read_line(reader)) != b"":
+                    if line is None:
+                        continue  # oversized message, already logged
+                    metrics.incr("pubsub.received")
+                    _deliver(
+                        self._handler, line.decode("utf-8", "replace").rstrip("\n")
+                    )
+                    # Let socket writers drain between alerts (reads don't
+                    # yield while lines are already buffered)
+                    await asyncio.sleep(0)
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                self._writer = None
+                self._connected.clear()
+                writer.close()
+            print("[WARN] Pub/sub relay connection lost, reconnecting")
+            await asyncio.sleep(PUBSUB_RECONNECT)
+
+    async def publish(self, message: str):
+        writer = self._writer
+        data = message.encode("utf-8") + b"\n"
+        if writer is None or len(data) > PUBSUB_MAX_LINE:
+            # Too long for the relay's line limit: every reader would drop it
+            metrics.incr("pubsub.dropped")
+            return
+        try:
+            writer.write(data)
+            await writer.drain()
+            metrics.incr("pubsub.published")
+        except OSError:
+            metrics.incr("pubsub.dropped")  # reader loop will reconnect
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "url": f"tcp://{self.host}:{self.port}",
+            "connected": self._writer is not None,
+        }
+
+
+class RedisBroker:
+    """Redis PUB/SUB on ``PUBSUB_CHANNEL``."""
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str = PUBSUB_CHANNEL):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("PUBSUB_BACKEND=redis needs the 'redis' package") from e
+        self.url = url or "redis://localhost:6379/0"
+        self.channel = channel
+        self._client = aioredis.from_url(self.url, decode_responses=True)
+        self._handler = None
+        self._task: asyncio.Task | None = None
+        self._connected = False
+
+    async def start(self, handler):
+        self._handler = handler
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._connected = True
+                print(f"[OK] Pub/sub subscribed to {self.channel} on Redis")
+                async for msg in pubsub.listen():
+                    if msg.get("type") == "message":
+                        metrics.incr("pubsub.received")
+                        _deliver(self._handler, msg["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[WARN] Pub/sub Redis connection lost ({e}), reconnecting")
+            finally:
+                self._connected = False
+                await pubsub.aclose()
+            await asyncio.sleep(PUBSUB_RECONNECT)
+
+    async def publish(self, message: str):
+        try:
+            await self._client.publish(self.channel, message)
+            metrics.incr("pubsub.published")
+        except Exception as e:
+            metrics.incr("pubsub.dropped")
+            print(f"[WARN] Pub/sub publish failed: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "connected": self._connected}
+
+
+def create_broker(backend: str = PUBSUB_BACKEND, url: str = PUBSUB_URL):
+    """Broker for ``backend``; falls back to ``LocalBroker`` if it can't be built."""
+    try:
+        if backend == "redis":
+            return RedisBroker(url)
+        if backend == "tcp":
+            return TcpBroker(url or "tcp://127.0.0.1:8765")
+        if backend != "local":
+            print(f"[WARN] Unknown PUBSUB_BACKEND '{backend}', using local")
+    except RuntimeError as e:
+        print(f"[WARN] {e}; alerts stay local to this worker")
+    return LocalBroker()
+
+
+# --------------------------------------------------
+# Stand-in relay for PUBSUB_BACKEND=tcp
+# --------------------------------------------------
+async def serve_relay(host: str = "127.0.0.1", port: int = 8765):
+    """Relay every line a client sends to all other connected clients."""
+    clients: set[asyncio.StreamWriter] = set()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        clients.add(writer)
+        try:
+            while (line := await _read_line(reader)) != b"":
+                if line is None:
+                    continue  # oversized: don't forward, keep the client
+                for other in list(clients):
+                    if other is writer:
+                        continue
+                    if (
+                        other.transport.get_write_buffer_size()
+                        > PUBSUB_RELAY_MAX_BUFFER
+                    ):
+                        clients.discard(other)  # subscriber can't keep up
+                        other.close()
+                        continue
+                    other.write(line)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            clients.discard(writer)
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port, limit=PUBSUB_MAX_LINE)
+    print(f"[OK] Pub/sub relay listening on tcp://{host}:{port}")
+    return server
+
+
+async def _main(host: str, port: int):
+    server = await serve_relay(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suraksha-Net alert pub/sub relay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
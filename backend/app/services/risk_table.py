@@ -0,0 +1,308 @@
+"""
+Precomputed risk lookup table for the severity model.
+
+At inference time the 15-feature vector depends only on weather, road
+condition and hour of day: the casualty fields are always zero, traffic
+density is fixed and location is not a model input. That leaves a few
+hundred distinct inputs, so every combination is pushed through
+``predict_proba`` once when the artifacts load and the class
+probabilities are kept in a dense array. Requests then cost one index
+lookup instead of a forest traversal.
+
+The table is registered as derived state on the model registry, so it
+is rebuilt as part of every (hot) reload of the artifacts.
+
+``risk_proba`` is the single scoring entry point for the API and the
+navigation service. ``RISK_SCORER=forest`` switches it from the table to
+the flattened-forest evaluator (``app.services.forest``), which is the
+fast path if per-location features ever make the table impractical.
+"""
+
+import os
+import time
+
+import numpy as np
+
+from app.services.forest import FlatForest
+from app.services.model_registry import registry
+
+RISK_SCORER = os.getenv("RISK_SCORER", "table")  # table | forest
+
+# --------------------------------------------------
+# Feature engineering (must match train.py's 15-feature FEATURES list)
+# --------------------------------------------------
+ROAD_RISK = {
+    "Slippery": 4,
+    "Potholed": 3,
+    "Under Construction": 3,
+    "Wet": 2,
+    "Dry": 1,
+    "Good": 1,
+}
+TIME_RISK = {
+    "Late Night": 3,
+    "Night": 2,
+    "Morning Rush": 2,
+    "Evening Rush": 2,
+    "Afternoon": 1,
+    "Midday": 1,
+}
+WEATHER_SEVERITY = {
+    "Clear": 1,
+    "Cloudy": 1,
+    "Rainy": 3,
+    "Foggy": 2,
+    "Stormy": 4,
+    "Hail": 4,
+    "Snowy": 3,
+}
+TRAFFIC_DENSITY = 5  # medium — unknown at prediction time
+
+
+def time_bin(hour: int) -> str:
+    if 6 <= hour < 10:
+        return "Morning Rush"
+    if 10 <= hour < 12:
+        return "Midday"
+    if 12 <= hour < 16:
+        return "Afternoon"
+    if 16 <= hour < 20:
+        return "Evening Rush"
+    if 20 <= hour < 23:
+        return "Night"
+    return "Late Night"
+
+
+def day_night(hour: int) -> str:
+    return "Nighttime" if hour >= 20 or hour < 6 else "Daytime"
+
+
+def safe_encode(encoders: dict, key: str, value: str) -> int:
+    try:
+        return int(encoders[key].transform([value])[0])
+    except (ValueError, KeyError):
+        return 0
+
+
+def feature_row(
+    encoders: dict,
+    weather: str = "Clear",
+    road_condition: str = "Dry",
+    hour: int = 12,
+) -> list:
+    """Builds one 15-feature row matching train.py's FEATURES order."""
+    tb = time_bin(hour)
+    dn = day_night(hour)
+
+    weather_sev = WEATHER_SEVERITY.get(weather, 2)
+    road_risk_n = ROAD_RISK.get(road_condition, 2)
+
+    # Casualty fields = 0 at inference (they're outcomes, not inputs)
+    return [
+        safe_encode(encoders, "Weather", weather),
+        safe_encode(encoders, "Road_Condition", road_condition),
+        safe_encode(encoders, "Time_Bin", tb),
+        safe_encode(encoders, "Day_Night", dn),
+        weather_sev,
+        TRAFFIC_DENSITY,
+        road_risk_n,
+        TIME_RISK.get(tb, 1),
+        1 if dn == "Nighttime" else 0,
+        weather_sev * road_risk_n,
+        0,
+        0,  # casualty_severity_idx, total_casualties
+        0,
+        0,
+        0,  # fatalities, serious_injuries, minor_injuries
+    ]
+
+
+_TIME_BINS = [time_bin(h) for h in range(24)]
+_DAY_NIGHT = [day_night(h) for h in range(24)]
+
+
+def encode_labels(encoder, values) -> np.ndarray:
+    """Vectorized ``LabelEncoder.transform``; unseen values encode to 0."""
+    classes = np.asarray(encoder.classes_).astype(str)
+    values = np.asarray(values, dtype=str)
+    if classes.size == 0:
+        return np.zeros(values.shape, dtype=np.int64)
+    # LabelEncoder keeps classes_ sorted, so a binary search finds each code
+    pos = np.clip(np.searchsorted(classes, values), 0, classes.size - 1)
+    return np.where(classes[pos] == values, pos, 0)
+
+
+def _map_values(values, mapping: dict, default) -> np.ndarray:
+    uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return np.array([mapping.get(u, default) for u in uniques])[inverse]
+
+
+def feature_matrix(encoders: dict, weathers, road_conditions, hours) -> np.ndarray:
+    """Vectorized ``feature_row`` for many inputs, shape (n, 15)."""
+    weathers = np.asarray(weathers, dtype=str)
+    road_conditions = np.asarray(road_conditions, dtype=str)
+    hours = np.asarray(hours, dtype=np.int64) % 24
+    n = weathers.shape[0]
+
+    def by_hour(key, labels):
+        return encode_labels(encoders[key], labels)[hours]
+
+    weather_sev = _map_values(weathers, WEATHER_SEVERITY, 2)
+    road_risk_n = _map_values(road_conditions, ROAD_RISK, 2)
+    X = np.zeros((n, 15))
+    X[:, 0] = encode_labels(encoders["Weather"], weathers)
+    X[:, 1] = encode_labels(encoders["Road_Condition"], road_conditions)
+    X[:, 2] = by_hour("Time_Bin", _TIME_BINS)
+    X[:, 3] = by_hour("Day_Night", _DAY_NIGHT)
+    X[:, 4] = weather_sev
+    X[:, 5] = TRAFFIC_DENSITY
+    X[:, 6] = road_risk_n
+    X[:, 7] = np.array([TIME_RISK.get(tb, 1) for tb in _TIME_BINS])[hours]
+    X[:, 8] = np.array([dn == "Nighttime" for dn in _DAY_NIGHT])[hours]
+    X[:, 9] = weather_sev * road_risk_n
+    # Columns 10-14 (casualty fields) stay 0 at inference
+    return X
+
+
+# --------------------------------------------------
+# Lookup table
+# --------------------------------------------------
+# Stand-in for any weather / road value the encoders and risk maps don't
+# know: it encodes to 0 and takes the maps' default, exactly like an
+# unseen string would.
+_UNKNOWN = "\x00unknown"
+
+
+class SeverityClasses:
+    """Class labels of the severity model and the "High" column among them."""
+
+    def __init__(self, severity_encoder):
+        self.classes = [str(c) for c in severity_encoder.classes_]
+        try:
+            self.high_index = self.classes.index("High")
+        except ValueError:
+            self.high_index = None
+
+    def high_probability(self, proba: np.ndarray) -> np.ndarray | float:
+        """Probability of the "High" class (0.5 if the model has none)."""
+        if self.high_index is None:
+            return np.full(proba.shape[:-1], 0.5) if proba.ndim > 1 else 0.5
+        return proba[..., self.high_index]
+
+
+class RiskTable(SeverityClasses):
+    """Dense (weather, road_condition, hour) → class-probability table."""
+
+    def __init__(self, model, encoders, severity_encoder, version=None):
+        super().__init__(severity_encoder)
+        self.version = version
+
+        weathers = sorted(set(encoders["Weather"].classes_) | set(WEATHER_SEVERITY))
+        roads = sorted(set(encoders["Road_Condition"].classes_) | set(ROAD_RISK))
+        self.weathers = [str(w) for w in weathers]
+        self.road_conditions = [str(r) for r in roads]
+        self._weather_idx = {str(w): i for i, w in enumerate(weathers)}
+        self._road_idx = {str(r): i for i, r in enumerate(roads)}
+        # Last slot on each axis holds the "unknown value" row
+        self._weather_other = len(weathers)
+        self._road_other = len(roads)
+
+        rows = [
+            feature_row(encoders, w, r, h)
+            for w in [*weathers, _UNKNOWN]
+            for r in [*roads, _UNKNOWN]
+            for h in range(24)
+        ]
+        proba = model.predict_proba(np.asarray(rows))
+        self.proba = proba.reshape(len(weathers) + 1, len(roads) + 1, 24, -1)
+
+    def __len__(self) -> int:
+        return int(np.prod(self.proba.shape[:3]))
+
+    def _index(self, weather: str, road_condition: str, hour: int):
+        return (
+            self._weather_idx.get(weather, self._weather_other),
+            self._road_idx.get(road_condition, self._road_other),
+            int(hour) % 24,
+        )
+
+    def lookup(self, weather: str, road_condition: str, hour: int) -> np.ndarray:
+        """Class probabilities (ordered like ``classes``) for one input."""
+        return self.proba[self._index(weather, road_condition, hour)]
+
+    def lookup_batch(self, weathers, road_conditions, hours) -> np.ndarray:
+        """Class probabilities for many inputs, shape (n, n_classes)."""
+        w = np.fromiter(
+            (self._weather_idx.get(x, self._weather_other) for x in weathers),
+            dtype=np.intp,
+        )
+        r = np.fromiter(
+            (self._road_idx.get(x, self._road_other) for x in road_conditions),
+            dtype=np.intp,
+        )
+        h = np.asarray(hours, dtype=np.intp) % 24
+        return self.proba[w, r, h]
+
+
+# --------------------------------------------------
+# Shared instance, rebuilt with every model (re)load
+# --------------------------------------------------
+def _build_table(bundle) -> RiskTable:
+    started = time.perf_counter()
+    table = RiskTable(
+        bundle.model,
+        bundle.encoders,
+        bundle.severity_encoder,
+        version=bundle.version,
+    )
+    print(
+        f"[OK] Risk lookup table built: {len(table)} combinations "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return table
+
+
+registry.register_derived("risk_table", _build_table)
+registry.register_derived("flat_forest", lambda b: FlatForest.from_sklearn(b.model))
+
+
+def get_risk_table() -> RiskTable | None:
+    """The lookup table for the currently loaded models (None if unavailable)."""
+    bundle = registry.get()
+    return bundle.derived("risk_table") if bundle is not None else None
+
+
+def severity_classes(bundle) -> SeverityClasses:
+    """The bundle's risk table, or just its class labels if the table failed."""
+    table = bundle.derived("risk_table")
+    return table if table is not None else SeverityClasses(bundle.severity_encoder)
+
+
+def risk_proba(weathers, road_conditions, hours):
+    """
+    Class probabilities for many (weather, road_condition, hour) inputs.
+
+    Returns ``(proba, table)`` — proba has shape (n, n_classes) and the
+    table (from the same model version) supplies ``classes`` and
+    ``high_probability``. If the derived table or forest failed to build,
+    the model's own ``predict_proba`` is used and ``table`` is a plain
+    ``SeverityClasses``. Returns None if the models aren't loaded.
+    """
+    bundle = registry.get()
+    if bundle is None:
+        return None
+    table = bundle.derived("risk_table")
+    if RISK_SCORER == "table" and table is not None:
+        return table.lookup_batch(weathers, road_conditions, hours), table
+
+    # Flattened forest, or sklearn itself if that derived state failed too
+    classes = severity_classes(bundle)
+    forest = bundle.derived("flat_forest")
+    if forest is not None:
+        rows = [
+            feature_row(bundle.encoders, w, r, int(h) % 24)
+            for w, r, h in zip(weathers, road_conditions, hours)
+        ]
+        return forest.predict_proba(rows), classes
+    X = feature_matrix(bundle.encoders, weathers, road_conditions, hours)
+    return bundle.model.predict_proba(X), classes
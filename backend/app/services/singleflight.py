@@ -0,0 +1,43 @@
+"""
+Single-flight coalescing for upstream calls.
+
+When many requests ask for the same thing at once (e.g. everyone
+analysing the same route at rush hour), only the first one calls the
+provider; the others await that same in-flight call and share its
+result (or exception). Caches only help once a call has finished —
+this covers the window while it is still running.
+
+The upstream call runs as its own task, so a caller that disconnects
+doesn't cancel the call for everyone else waiting on it.
+"""
+
+import asyncio
+
+from app.services.metrics import metrics
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict = {}  # key → asyncio.Task
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Await ``fn(*args, **kwargs)``, sharing one call per concurrent ``key``."""
+        task = self._inflight.get(key)
+        if task is None:
+            metrics.incr(f"singleflight.{self.name}.calls")
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            metrics.incr(f"singleflight.{self.name}.shared")
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            metrics.incr(f"singleflight.{self.name}.errors")
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,322 @@
+"""
+Durable SOS event store (SQLite, WAL mode).
+
+- IDs come from an ``AUTOINCREMENT`` key, so they are unique and
+  monotonic across concurrent requests and across uvicorn workers that
+  share the database file (shown to clients as ``SOS-0001``).
+- Indexes on ``(status, created_at)`` and ``created_at`` serve the admin
+  list filters; keyset pagination (``before`` = last id seen) keeps deep
+  pages as cheap as the first one.
+- Each event also stores its grid cell (``SOS_CELL_DEG``, ~1.1 km), and
+  ``(status, cell_row, cell_col)`` is indexed, so "active SOS within R km"
+  only reads the cells overlapping the search circle before the exact
+  haversine check.
+
+Writes never run on the event loop. ``add()`` queues the event and a
+single writer inserts everything queued since its last pass in one
+transaction on a worker thread (group commit), so bursts of thousands
+of SOS per second cost a handful of commits rather than one each.
+
+The database opens on first use. If it can't be opened (read-only disk,
+bad ``SOS_DB_PATH``, locked file), the store logs a warning and falls
+back to an in-memory database so SOS keeps working until restart.
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from app.services.geo import KM_PER_DEG_LAT, haversine_km
+from app.services.metrics import metrics
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / ".data" / "sos.sqlite3"
+SOS_DB_PATH = Path(os.getenv("SOS_DB_PATH", str(_DEFAULT_PATH)))
+SOS_CELL_DEG = float(os.getenv("SOS_CELL_DEG", "0.01"))
+SOS_WRITE_BATCH = int(os.getenv("SOS_WRITE_BATCH", "500"))
+
+STATUSES = ("active", "acknowledged", "resolved")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sos_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    cell_row INTEGER NOT NULL,
+    cell_col INTEGER NOT NULL,
+    timestamp TEXT,
+    nearest_hotspot TEXT,
+    driver_name TEXT,
+    status TEXT NOT NULL DEFAULT 'active',
+    created_at TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS sos_status_time ON sos_events (status, created_at);
+CREATE INDEX IF NOT EXISTS sos_time ON sos_events (created_at);
+CREATE INDEX IF NOT EXISTS sos_status_cell ON sos_events (status, cell_row, cell_col);
+"""
+
+_COLUMNS = (
+    "id, lat, lon, timestamp, nearest_hotspot, driver_name, status, "
+    "created_at, updated_at"
+)
+
+
+def format_id(row_id: int) -> str:
+    return f"SOS-{row_id:04d}"
+
+
+def parse_id(sos_id: str) -> int | None:
+    try:
+        return int(str(sos_id).removeprefix("SOS-"))
+    except ValueError:
+        return None
+
+
+def _row_to_event(row) -> dict:
+    return {
+        "id": format_id(row[0]),
+        "lat": row[1],
+        "lon": row[2],
+        "timestamp": row[3],
+        "nearest_hotspot": row[4],
+        "driver_name": row[5],
+        "status": row[6],
+        "created_at": row[7],
+        "updated_at": row[8],
+    }
+
+
+class SosStore:
+    def __init__(self, path: Path = SOS_DB_PATH, cell_deg: float = SOS_CELL_DEG):
+        self.path = Path(path)
+        self.cell_deg = cell_deg
+        # Connections open on first use (always on a worker thread), so a
+        # bad SOS_DB_PATH can't stop the app from importing
+        self._write_conn: sqlite3.Connection | None = None
+        self._read_conn: sqlite3.Connection | None = None
+        self._open_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self.in_memory = False
+        self._pending: list[tuple[tuple, asyncio.Future]] = []
+        self._flusher: asyncio.Task | None = None
+
+    def _open(self):
+        if self._read_conn is not None:
+            return
+        with self._open_lock:
+            if self._read_conn is not None:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # Separate connections so list/nearby reads don't queue behind
+                # a write batch (WAL lets readers and the writer run concurrently)
+                write_conn = self._connect(self.path)
+                write_conn.executescript(_SCHEMA)
+                read_conn = self._connect(self.path)
+                print(f"[OK] SOS store opened at {self.path}")
+            except (OSError, sqlite3.Error) as e:
+                print(
+                    f"[WARN] SOS store unavailable at {self.path} ({e}); "
+                    "keeping SOS events in memory until restart"
+                )
+                write_conn = self._connect(":memory:")
+                write_conn.executescript(_SCHEMA)
+                # One in-memory database: reads share the writer's connection
+                read_conn = write_conn
+                self._read_lock = self._write_lock
+                self.in_memory = True
+            self._write_conn = write_conn
+            self._read_conn = read_conn
+
+    @staticmethod
+    def _connect(path) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    # ------------------------------------------------------------------
+    # Writes (group commit on a worker thread)
+    # ------------------------------------------------------------------
+    async def add(
+        self,
+        lat: float,
+        lon: float,
+        timestamp: str | None = None,
+        nearest_hotspot: str | None = None,
+        driver_name: str | None = None,
+    ) -> dict:
+        """Persist a new active SOS; returns the stored event."""
+        now = datetime.now().isoformat()
+        row = (
+            lat,
+            lon,
+            *self._cell(lat, lon),
+            timestamp or now,
+            nearest_hotspot,
+            driver_name,
+            now,
+        )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        row_id = await future
+        return {
+            "id": format_id(row_id),
+            "lat": lat,
+            "lon": lon,
+            "timestamp": row[4],
+            "nearest_hotspot": nearest_hotspot,
+            "driver_name": driver_name,
+            "status": "active",
+            "created_at": now,
+            "updated_at": None,
+        }
+
+    async def _flush(self):
+        while self._pending:
+            batch = self._pending[:SOS_WRITE_BATCH]
+            del self._pending[:SOS_WRITE_BATCH]
+            try:
+                ids = await asyncio.to_thread(self._insert, [row for row, _ in batch])
+            except Exception as e:
+                metrics.incr("sos.write_errors")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            metrics.observe("sos.batch_size", len(batch))
+            for (_, future), row_id in zip(batch, ids):
+                if not future.done():
+                    future.set_result(row_id)
+
+    def _insert(self, rows: list[tuple]) -> list[int]:
+        self._open()
+        with self._write_lock:
+            conn = self._write_conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [
+                    conn.execute(
+                        "INSERT INTO sos_events (lat, lon, cell_row, cell_col, "
+                        "timestamp, nearest_hotspot, driver_name, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        row,
+                    ).lastrowid
+                    for row in rows
+                ]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def set_status(self, sos_id: str, status: str) -> dict | None:
+        """Change an event's status; returns the updated event (None if unknown)."""
+        row_id = parse_id(sos_id)
+        if row_id is None:
+            return None
+        self._open()
+        with self._write_lock:
+            cur = self._write_conn.execute(
+                "UPDATE sos_events SET status = ?, updated_at = ? WHERE id = ?",
+                (status, datetime.now().isoformat(), row_id),
+            )
+        if cur.rowcount == 0:
+            return None
+        return self.get(sos_id)
+
+    # ------------------------------------------------------------------
+    # Reads (call via asyncio.to_thread from request handlers)
+    # ------------------------------------------------------------------
+    def _query(self, sql: str, params=()) -> list:
+        self._open()
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def get(self, sos_id: str) -> dict | None:
+        row_id = parse_id(sos_id)
+        if row_id is None:
+            return None
+        rows = self._query(f"SELECT {_COLUMNS} FROM sos_events WHERE id = ?", (row_id,))
+        return _row_to_event(rows[0]) if rows else None
+
+    def page(
+        self,
+        status: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        before: int | None = None,
+        limit: int | None = 50,
+    ) -> list[dict]:
+        """
+        Events newest first; ``before`` is the keyset cursor (an id).
+        ``limit=None`` returns every matching event.
+        """
+        where, params = [], []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if since:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until:
+            where.append("created_at < ?")
+            params.append(until)
+        if before is not None:
+            where.append("id < ?")
+            params.append(before)
+        sql = f"SELECT {_COLUMNS} FROM sos_events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [_row_to_event(r) for r in self._query(sql, params)]
+
+    def within(
+        self, lat: float, lon: float, km: float, status: str | None = "active"
+    ) -> list[dict]:
+        """Events within ``km`` of (lat, lon), nearest first, with ``distance_km``."""
+        pad_lat = km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(lat) + pad_lat))), 1e-6)
+        pad_lon = pad_lat / cos_lat
+        r0, c0 = self._cell(lat - pad_lat, lon - pad_lon)
+        r1, c1 = self._cell(lat + pad_lat, lon + pad_lon)
+        sql = (
+            f"SELECT {_COLUMNS} FROM sos_events "
+            "WHERE cell_row BETWEEN ? AND ? AND cell_col BETWEEN ? AND ?"
+        )
+        params = [r0, r1, c0, c1]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        found = []
+        for row in self._query(sql, params):
+            d = float(haversine_km(lat, lon, row[1], row[2]))
+            if d <= km:
+                event = _row_to_event(row)
+                event["distance_km"] = round(d, 3)
+                found.append(event)
+        found.sort(key=lambda e: e["distance_km"])
+        return found
+
+    def counts(self) -> dict:
+        rows = self._query("SELECT status, COUNT(*) FROM sos_events GROUP BY status")
+        return dict(rows)
+
+
+# Singleton instance
+store = SosStore()
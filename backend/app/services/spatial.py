@@ -0,0 +1,260 @@
+"""
+Uniform-grid spatial index over accident coordinates.
+
+Points are bucketed into fixed-size lat/lng cells and stored sorted by
+cell id, so bounding-box, radius and k-nearest queries only touch the
+cells that overlap the query instead of scanning the whole dataset.
+All queries return positional row indices (for ``DataFrame.iloc``) in
+ascending order, matching the order a boolean mask would produce.
+"""
+
+import numpy as np
+
+from app.services.geo import KM_PER_DEG_LAT, haversine_km
+
+DEFAULT_CELL_DEG = 0.01  # ~1.1 km
+
+
+def _lng_pad(lat: float, km: float) -> float:
+    cos_lat = np.cos(np.radians(min(89.0, abs(lat) + km / KM_PER_DEG_LAT)))
+    return km / (KM_PER_DEG_LAT * max(cos_lat, 1e-6))
+
+
+class GridIndex:
+    """Static grid index built once over a set of (lat, lng) points."""
+
+    def __init__(self, lats, lngs, cell_deg: float = DEFAULT_CELL_DEG):
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.size = len(lats)
+
+        valid = np.flatnonzero(np.isfinite(lats) & np.isfinite(lngs))
+        if valid.size == 0:
+            self._row0 = self._col0 = 0
+            self._n_rows = self._n_cols = 0
+            self._cells = np.empty(0, dtype=np.int64)
+            self._pos = np.empty(0, dtype=np.int64)
+            self._lats = self._lngs = np.empty(0)
+            return
+
+        rows = np.floor(lats[valid] / cell_deg).astype(np.int64)
+        cols = np.floor(lngs[valid] / cell_deg).astype(np.int64)
+        self._row0, self._col0 = int(rows.min()), int(cols.min())
+        rows -= self._row0
+        cols -= self._col0
+        self._n_rows = int(rows.max()) + 1
+        self._n_cols = int(cols.max()) + 1
+
+        cells = rows * self._n_cols + cols
+        order = np.argsort(cells, kind="stable")
+        self._cells = cells[order]
+        self._pos = valid[order]
+        self._lats = lats[self._pos]
+        self._lngs = lngs[self._pos]
+
+    def __len__(self) -> int:
+        return self.size
+
+    # ------------------------------------------------------------------
+    # Internal: sorted-array slots of all points in the overlapping cells
+    # ------------------------------------------------------------------
+    def _candidate_slots(self, min_lat, max_lat, min_lng, max_lng) -> np.ndarray:
+        if self._cells.size == 0 or min_lat > max_lat or min_lng > max_lng:
+            return np.empty(0, dtype=np.int64)
+        r_lo = max(int(np.floor(min_lat / self.cell_deg)) - self._row0, 0)
+        r_hi = min(
+            int(np.floor(max_lat / self.cell_deg)) - self._row0, self._n_rows - 1
+        )
+        c_lo = max(int(np.floor(min_lng / self.cell_deg)) - self._col0, 0)
+        c_hi = min(
+            int(np.floor(max_lng / self.cell_deg)) - self._col0, self._n_cols - 1
+        )
+        if r_lo > r_hi or c_lo > c_hi:
+            return np.empty(0, dtype=np.int64)
+
+        # Cells of one grid row are contiguous in the sorted order, so each
+        # row of the query box is a single slice.
+        grid_rows = np.arange(r_lo, r_hi + 1, dtype=np.int64) * self._n_cols
+        starts = np.searchsorted(self._cells, grid_rows + c_lo, side="left")
+        ends = np.searchsorted(self._cells, grid_rows + c_hi, side="right")
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        # Vectorized concatenation of the ranges [start, end)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(total, dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def bbox(self, min_lat, max_lat, min_lng, max_lng) -> np.ndarray:
+        """Row positions inside the (inclusive) bounding box."""
+        slots = self._candidate_slots(min_lat, max_lat, min_lng, max_lng)
+        if slots.size == 0:
+            return slots
+        lat = self._lats[slots]
+        lng = self._lngs[slots]
+        keep = (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        return np.sort(self._pos[slots[keep]])
+
+    def radius(self, lat: float, lng: float, km: float) -> np.ndarray:
+        """Row positions within ``km`` (haversine) of (lat, lng)."""
+        pos, _ = self._within(lat, lng, km)
+        return np.sort(pos)
+
+    def nearest(self, lat: float, lng: float, k: int = 1):
+        """
+        The ``k`` nearest points to (lat, lng).
+
+        Returns (positions, distances_km), ordered nearest first.
+        """
+        if self._cells.size == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, self._cells.size)
+        km = self.cell_deg * KM_PER_DEG_LAT
+        max_km = (self._n_rows + self._n_cols + 2) * km
+        while True:
+            pos, dist = self._within(lat, lng, km)
+            if pos.size >= k or km >= max_km:
+                break
+            km *= 2
+        if pos.size < k:
+            # Query point lies far outside the data extent — fall back to all.
+            dist = haversine_km(lat, lng, self._lats, self._lngs)
+            pos = self._pos
+        top = np.argsort(dist, kind="stable")[:k]
+        return pos[top], dist[top]
+
+    def _within(self, lat, lng, km):
+        pad_lat = km / KM_PER_DEG_LAT
+        pad_lng = _lng_pad(lat, km)
+        slots = self._candidate_slots(
+            lat - pad_lat, lat + pad_lat, lng - pad_lng, lng + pad_lng
+        )
+        if slots.size == 0:
+            return slots, np.empty(0)
+        dist = haversine_km(lat, lng, self._lats[slots], self._lngs[slots])
+        keep = dist <= km
+        return self._pos[slots[keep]], dist[keep]
+
+
+# --------------------------------------------------
+# Window aggregation via a summed-area table
+# --------------------------------------------------
+DEFAULT_SAT_RES_DEG = 0.001
+MAX_SAT_CELLS = 4_000_000
+# Coarsening stops once a window would span fewer cells than this; the
+# centers are split into groups with smaller extents instead
+MIN_WINDOW_CELLS = 5
+
+
+def window_means(
+    lats,
+    lngs,
+    values,
+    center_lats,
+    center_lngs,
+    half_deg: float,
+    res_deg: float = DEFAULT_SAT_RES_DEG,
+    max_cells: int = MAX_SAT_CELLS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mean of ``values`` inside a ±``half_deg`` box around every center.
+
+    The points are binned once into a grid covering the centers' extent and
+    turned into summed-area tables of value sums and counts, so each window
+    costs four lookups regardless of how many points it holds. Window edges
+    snap to the nearest grid line (error ≤ ``res_deg / 2`` per edge); the
+    grid is coarsened if it would exceed ``max_cells``, but never below
+    ``MIN_WINDOW_CELLS`` cells per window. Centers spread too far for that
+    (a long route) are split into consecutive groups, each with its own
+    smaller table.
+
+    Returns (means, counts); windows with no points get a mean of 0.
+    """
+    center_lats = np.asarray(center_lats, dtype=np.float64)
+    center_lngs = np.asarray(center_lngs, dtype=np.float64)
+    n_centers = center_lats.shape[0]
+    if n_centers == 0:
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    lat0 = center_lats.min() - half_deg
+    lng0 = center_lngs.min() - half_deg
+    span_lat = center_lats.max() + half_deg - lat0
+    span_lng = center_lngs.max() + half_deg - lng0
+    cells = (span_lat / res_deg + 1) * (span_lng / res_deg + 1)
+    if cells > max_cells:
+        coarse = res_deg * float(np.sqrt(cells / max_cells))
+        if coarse <= 2 * half_deg / MIN_WINDOW_CELLS or n_centers == 1:
+            res_deg = coarse
+        else:
+            # Halve the centers (consecutive, so route order keeps each
+            # group compact) and give each half only the points it can see
+            parts = []
+            for sl in (slice(0, n_centers // 2), slice(n_centers // 2, None)):
+                c_lats, c_lngs = center_lats[sl], center_lngs[sl]
+                near = (
+                    (lats >= c_lats.min() - half_deg)
+                    & (lats <= c_lats.max() + half_deg)
+                    & (lngs >= c_lngs.min() - half_deg)
+                    & (lngs <= c_lngs.max() + half_deg)
+                )
+                parts.append(
+                    window_means(
+                        lats[near],
+                        lngs[near],
+                        values[near],
+                        c_lats,
+                        c_lngs,
+                        half_deg,
+                        res_deg,
+                        max_cells,
+                    )
+                )
+            return (
+                np.concatenate([parts[0][0], parts[1][0]]),
+                np.concatenate([parts[0][1], parts[1][1]]),
+            )
+    n_rows = int(np.ceil(span_lat / res_deg)) + 1
+    n_cols = int(np.ceil(span_lng / res_deg)) + 1
+
+    rows = np.floor((lats - lat0) / res_deg)
+    cols = np.floor((lngs - lng0) / res_deg)
+    inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+    inside &= np.isfinite(values)
+    flat = rows[inside].astype(np.int64) * n_cols + cols[inside].astype(np.int64)
+
+    sat_sum = np.zeros((n_rows + 1, n_cols + 1))
+    sat_cnt = np.zeros((n_rows + 1, n_cols + 1), dtype=np.int64)
+    sat_sum[1:, 1:] = np.bincount(
+        flat, weights=values[inside], minlength=n_rows * n_cols
+    ).reshape(n_rows, n_cols)
+    sat_cnt[1:, 1:] = np.bincount(flat, minlength=n_rows * n_cols).reshape(
+        n_rows, n_cols
+    )
+    sat_sum.cumsum(axis=0, out=sat_sum)
+    sat_sum.cumsum(axis=1, out=sat_sum)
+    sat_cnt.cumsum(axis=0, out=sat_cnt)
+    sat_cnt.cumsum(axis=1, out=sat_cnt)
+
+    def edge(coord, origin, limit):
+        return np.clip(np.rint((coord - origin) / res_deg), 0, limit).astype(np.int64)
+
+    r0 = edge(center_lats - half_deg, lat0, n_rows)
+    r1 = edge(center_lats + half_deg, lat0, n_rows)
+    c0 = edge(center_lngs - half_deg, lng0, n_cols)
+    c1 = edge(center_lngs + half_deg, lng0, n_cols)
+
+    def box(sat):
+        return sat[r1, c1] - sat[r0, c1] - sat[r1, c0] + sat[r0, c0]
+
+    sums = box(sat_sum)
+    counts = box(sat_cnt)
+    means = np.divide(sums, counts, out=np.zeros(n_centers), where=counts > 0)
+    return means, counts
@@ -5,17 +5,51 @@ Provides current weather data and maps OWM conditions to
 Suraksha risk model categories.
 """
 
+import asyncio
 import os
 import time
-import requests
+
+import numpy as np
 from dotenv import load_dotenv
 from pathlib import Path
 
+from app.services import http_client
+from app.services.cache import LRUCache
+from app.services.metrics import metrics
+from app.services.risk_table import WEATHER_SEVERITY
+from app.services.singleflight import SingleFlight
+
 load_dotenv(Path(__file__).resolve().parent.parent.parent / ".env", override=True)
 
-# ── Cache: (lat_rounded, lon_rounded) → (timestamp, data) ──────────────────
-_weather_cache: dict[str, tuple[float, dict]] = {}
-CACHE_TTL = 600  # 10 minutes
+# ── Cache: "lat,lon" (2 decimals, ~1 km cell) → _Entry ─────────────────────
+# Bounded LRU. Entries stay usable past CACHE_TTL: a stale entry (younger
+# than WEATHER_MAX_STALE) is served immediately while a background refresh
+# runs, and refresh_hot_cells() re-fetches frequently used cells shortly
+# before they expire — so a cached area never waits on OpenWeatherMap.
+CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "600"))  # 10 minutes
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "4096"))
+WEATHER_MAX_STALE = int(os.getenv("WEATHER_MAX_STALE", "3600"))
+WEATHER_REFRESH_AHEAD = float(os.getenv("WEATHER_REFRESH_AHEAD", "0.8"))  # × TTL
+WEATHER_HOT_HITS = int(os.getenv("WEATHER_HOT_HITS", "3"))
+WEATHER_REFRESH_INTERVAL = float(os.getenv("WEATHER_REFRESH_INTERVAL", "30"))
+WEATHER_REFRESH_BATCH = int(os.getenv("WEATHER_REFRESH_BATCH", "20"))
+
+
+class _Entry:
+    __slots__ = ("fetched_at", "data", "hits", "lat", "lon")
+
+    def __init__(self, data: dict, lat: float, lon: float):
+        self.fetched_at = time.time()
+        self.data = data
+        self.hits = 0
+        self.lat = lat
+        self.lon = lon
+
+
+_weather_cache = LRUCache(WEATHER_CACHE_SIZE)
+_weather_flight = SingleFlight("weather")
+_refreshing: dict = {}  # cache key → background refresh task
+metrics.register_gauge("cache.weather", _weather_cache.stats)
 
 # ── OWM condition code → Suraksha weather category ─────────────────────────
 _OWM_TO_SURAKSHA = {
@@ -34,16 +68,67 @@ _OWM_TO_SURAKSHA = {
     range(801, 805): "Cloudy",
 }
 
+# Flattened into one slot per code (OWM codes are < 1000)
+_CONDITION_BY_CODE = ["Clear"] * 1000
+for _codes, _category in _OWM_TO_SURAKSHA.items():
+    for _code in _codes:
+        _CONDITION_BY_CODE[_code] = _category
+
 
 def _map_condition(owm_code: int) -> str:
     """Map an OpenWeatherMap condition code to a Suraksha category."""
-    for code_range, category in _OWM_TO_SURAKSHA.items():
-        if owm_code in code_range:
-            return category
+    if 0 <= owm_code < len(_CONDITION_BY_CODE):
+        return _CONDITION_BY_CODE[owm_code]
     return "Clear"
 
 
-def get_weather(lat: float, lon: float) -> dict | None:
+def _cache_key(lat: float, lon: float) -> str:
+    return f"{lat:.2f},{lon:.2f}"
+
+
+def _lookup(cache_key: str, api_key: str) -> tuple[bool, dict | None]:
+    """
+    Cached weather for a cell, stale-while-revalidate: entries past
+    CACHE_TTL (but within WEATHER_MAX_STALE) are returned as found and a
+    background refresh is scheduled.
+    """
+    entry = _weather_cache.get(cache_key)
+    if entry is None:
+        return False, None
+    age = time.time() - entry.fetched_at
+    if age >= WEATHER_MAX_STALE:
+        return False, None
+    entry.hits += 1
+    if age >= CACHE_TTL:
+        metrics.incr("weather.stale_served")
+        _schedule_refresh(cache_key, entry, api_key)
+    return True, entry.data
+
+
+def _schedule_refresh(cache_key: str, entry: _Entry, api_key: str):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # no event loop (sync caller) — next async lookup refreshes
+    if cache_key in _refreshing:
+        return
+    metrics.incr("weather.refresh")
+    task = loop.create_task(
+        _weather_flight.do(cache_key, _fetch_weather, entry.lat, entry.lon, api_key)
+    )
+    _refreshing[cache_key] = task
+    task.add_done_callback(lambda _: _refreshing.pop(cache_key, None))
+
+
+def cached_weather(lat: float, lon: float) -> tuple[bool, dict | None]:
+    """``(found, data)`` from the cache only — never waits on OpenWeatherMap."""
+    api_key = os.getenv("OPENWEATHER_API_KEY", "")
+    if not api_key:
+        return True, None  # get_weather would return None without a call
+    return _lookup(_cache_key(lat, lon), api_key)
+
+
+async def get_weather(lat: float, lon: float) -> dict | None:
     """
     Fetch current weather for a location from OpenWeatherMap.
 
@@ -57,12 +142,40 @@ def get_weather(lat: float, lon: float) -> dict | None:
         return None
 
     # Cache lookup (round to ~1 km precision)
-    cache_key = f"{lat:.2f},{lon:.2f}"
-    if cache_key in _weather_cache:
-        ts, cached = _weather_cache[cache_key]
-        if time.time() - ts < CACHE_TTL:
-            return cached
+    cache_key = _cache_key(lat, lon)
+    found, cached = _lookup(cache_key, api_key)
+    if found:
+        return cached
+
+    # Concurrent misses for the same ~1 km cell share one OWM call
+    return await _weather_flight.do(cache_key, _fetch_weather, lat, lon, api_key)
+
+
+async def refresh_hot_cells():
+    """
+    Background loop: every WEATHER_REFRESH_INTERVAL seconds, re-fetch up to
+    WEATHER_REFRESH_BATCH hot cells (>= WEATHER_HOT_HITS hits since their
+    last fetch) that are past WEATHER_REFRESH_AHEAD of their TTL.
+    """
+    while True:
+        await asyncio.sleep(WEATHER_REFRESH_INTERVAL)
+        api_key = os.getenv("OPENWEATHER_API_KEY", "")
+        if not api_key:
+            continue
+        now = time.time()
+        due = [
+            (key, entry)
+            for key, entry in _weather_cache.items()
+            if entry.hits >= WEATHER_HOT_HITS
+            and now - entry.fetched_at >= CACHE_TTL * WEATHER_REFRESH_AHEAD
+        ]
+        due.sort(key=lambda item: item[1].hits, reverse=True)
+        for key, entry in due[:WEATHER_REFRESH_BATCH]:
+            _schedule_refresh(key, entry, api_key)
+
 
+async def _fetch_weather(lat: float, lon: float, api_key: str) -> dict | None:
+    cache_key = _cache_key(lat, lon)
     try:
         url = "https://api.openweathermap.org/data/2.5/weather"
         params = {
@@ -71,9 +184,9 @@ def get_weather(lat: float, lon: float) -> dict | None:
             "appid": api_key,
             "units": "metric",
         }
-        resp = requests.get(url, params=params, timeout=8)
-        resp.raise_for_status()
-        data = resp.json()
+        data = await http_client.get_json(
+            url, params=params, timeout=8, raise_for_status=True
+        )
 
         owm_code = data["weather"][0]["id"]
         condition = _map_condition(owm_code)
@@ -108,7 +221,11 @@ def get_weather(lat: float, lon: float) -> dict | None:
             "alert_text": alert_text,
         }
 
-        _weather_cache[cache_key] = (time.time(), result)
+        entry = _Entry(result, lat, lon)
+        previous = _weather_cache.get(cache_key)
+        if previous is not None:
+            entry.hits = previous.hits // 2  # decay, so hot cells stay hot
+        _weather_cache.set(cache_key, entry)
         return result
 
     except Exception as e:
@@ -116,6 +233,106 @@ def get_weather(lat: float, lon: float) -> dict | None:
         return None
 
 
+# ── Along-route sampling ───────────────────────────────────────────────────
+WEATHER_ROUTE_MAX_CELLS = int(os.getenv("WEATHER_ROUTE_MAX_CELLS", "8"))
+
+
+async def sample_route_weather(
+    points, max_cells: int = WEATHER_ROUTE_MAX_CELLS
+) -> list[dict | None]:
+    """
+    Weather for every ``(lat, lon)`` in ``points`` (one or more routes).
+
+    Points are deduplicated to the cache's ~1 km cells; at most
+    ``max_cells`` cells, spread evenly along the route, are fetched (in
+    parallel, through the cache), and every other cell takes the weather
+    of the nearest sampled one. Outbound calls per route are therefore
+    bounded by ``max_cells`` regardless of route length.
+    """
+    if not points:
+        return []
+    keys, samples, cell_sample = _route_plan(points, max_cells)
+    sampled = await asyncio.gather(*(get_weather(lat, lon) for lat, lon in samples))
+    return [sampled[cell_sample[key]] for key in keys]
+
+
+def route_weather_samples(
+    points, max_cells: int = WEATHER_ROUTE_MAX_CELLS
+) -> list[tuple[float, float, int]]:
+    """
+    The points ``sample_route_weather`` fetches for ``points``, each with
+    the number of route points that take its weather. Enough to rebuild the
+    route summary later with ``cached_route_weather``.
+    """
+    if not points:
+        return []
+    keys, samples, cell_sample = _route_plan(points, max_cells)
+    weights = [0] * len(samples)
+    for key in keys:
+        weights[cell_sample[key]] += 1
+    return [(float(lat), float(lon), n) for (lat, lon), n in zip(samples, weights)]
+
+
+def cached_route_weather(samples) -> tuple[bool, dict | None]:
+    """
+    ``(found, summary)`` for ``route_weather_samples`` output, from the
+    cache only — found is False if any sampled cell isn't cached.
+    """
+    weathers = []
+    for lat, lon, n in samples:
+        found, weather = cached_weather(lat, lon)
+        if not found:
+            return False, None
+        weathers.extend([weather] * n)
+    return True, summarize_route_weather(weathers)
+
+
+def _route_plan(points, max_cells: int):
+    """
+    ``(keys, samples, cell_sample)``: the cache cell of every point, the
+    points to fetch (at most ``max_cells``, spread along the route) and,
+    per cell, the index of the nearest sample.
+    """
+    keys = [_cache_key(lat, lon) for lat, lon in points]
+    first_point: dict[str, int] = {}
+    for i, key in enumerate(keys):
+        first_point.setdefault(key, i)
+    cells = list(first_point)  # in route order
+
+    n_samples = min(len(cells), max(1, max_cells))
+    picks = np.unique(np.linspace(0, len(cells) - 1, n_samples).round().astype(int))
+
+    # Nearest sampled cell for every cell (lng scaled for latitude)
+    centers = np.array([points[first_point[c]] for c in cells], dtype=np.float64)
+    scale = np.cos(np.radians(centers[:, 0].mean()))
+    d_lat = centers[:, None, 0] - centers[None, picks, 0]
+    d_lng = (centers[:, None, 1] - centers[None, picks, 1]) * scale
+    nearest = np.argmin(d_lat**2 + d_lng**2, axis=1)
+    samples = [points[first_point[cells[i]]] for i in picks]
+    return keys, samples, dict(zip(cells, nearest.tolist()))
+
+
+def summarize_route_weather(weathers: list[dict | None]) -> dict | None:
+    """Share of route points per condition, worst condition and alerts."""
+    known = [w for w in weathers if w]
+    if not known:
+        return None
+    counts: dict[str, int] = {}
+    alerts = []
+    for w in known:
+        counts[w["condition"]] = counts.get(w["condition"], 0) + 1
+        if w.get("alert_text") and w["alert_text"] not in alerts:
+            alerts.append(w["alert_text"])
+    worst = max(counts, key=lambda c: WEATHER_SEVERITY.get(c, 2))
+    return {
+        "conditions": {c: round(n / len(known), 3) for c, n in counts.items()},
+        "worst": worst,
+        "worst_road_condition": get_road_condition_from_weather(worst),
+        "is_severe": any(w.get("is_severe") for w in known),
+        "alerts": alerts,
+    }
+
+
 def get_road_condition_from_weather(condition: str) -> str:
     """Map weather condition to likely road condition for the ML model."""
     mapping = {
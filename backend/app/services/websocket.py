@@ -2,79 +2,466 @@
 WebSocket manager for real-time push notifications.
 
 Supports:
-- Driver connections tracked by session ID
-- Zone-specific broadcasts from Admin
-- Targeted alerts (zone_entry, weather_warning, sos_nearby)
+- Driver connections tracked by session ID, each with a bounded send
+  queue drained by its own writer task (slow clients can't stall others)
+- Zone-specific broadcasts from Admin, delivered through a zone →
+  sessions index (drivers subscribe explicitly or by reported position)
+- Targeted alerts (zone_entry, weather_warning, sos_nearby); SOS goes
+  to drivers near it through a live index of reported positions
+- Multi-worker fan-out: alerts are also published on a pub/sub broker
+  (``app.services.pubsub``) and every worker delivers them to the
+  sockets it holds
+
+Targeting only narrows delivery for sessions that report a position or
+subscribe to zones. The web client reports its GPS position only while
+live tracking is on; every other session is unlocated and, with the
+default ``WS_UNZONED_GET_ZONE_ALERTS`` / ``WS_UNLOCATED_GET_NEARBY_ALERTS``,
+still receives every zone broadcast and SOS alert.
 """
 
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
 from datetime import datetime
 from fastapi import WebSocket
 
+from app.services.alert_log import AlertLog
+from app.services.metrics import metrics
+from app.services.positions import PositionIndex
+from app.services.pubsub import WORKER_ID, LocalBroker, create_broker
+from app.services.zones import ALL_ZONES, zones_at
+
+# Per-connection outbound queue. A broadcast only appends the (already
+# serialized) payload to each queue; a writer task per socket drains it,
+# so a slow client on 2G only ever delays itself.
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+# What to do when a client's queue is full:
+#   drop_oldest – evict the oldest queued alert (newest alerts win)
+#   drop_newest – discard the incoming alert
+#   disconnect  – close the slow consumer; it can reconnect and catch up
+WS_SLOW_POLICY = os.getenv("WS_SLOW_POLICY", "drop_oldest")
+# Sessions that never subscribed or reported a position still get every
+# zone broadcast (clients that predate zone subscriptions, and the web
+# client while live tracking is off).
+WS_UNZONED_GET_ZONE_ALERTS = (
+    os.getenv("WS_UNZONED_GET_ZONE_ALERTS", "true").lower() != "false"
+)
+# Likewise for proximity alerts (SOS): sessions that never reported a
+# position can't be placed, so by default they still receive them.
+WS_UNLOCATED_GET_NEARBY_ALERTS = (
+    os.getenv("WS_UNLOCATED_GET_NEARBY_ALERTS", "true").lower() != "false"
+)
+
+
+def encode_alert(alert: dict) -> str:
+    """Serialize once per broadcast (same format as ``send_json``)."""
+    return json.dumps(alert, separators=(",", ":"), ensure_ascii=False)
+
+
+class _Connection:
+    """One socket with its bounded outbound queue and writer task."""
+
+    __slots__ = (
+        "session_id",
+        "websocket",
+        "queue",
+        "ready",
+        "writer",
+        "dropped",
+        "explicit_zones",
+        "position_zones",
+        "zoned",
+    )
+
+    def __init__(self, session_id: str, websocket: WebSocket):
+        self.session_id = session_id
+        self.websocket = websocket
+        self.queue: deque[str] = deque()
+        self.ready = asyncio.Event()
+        self.writer: asyncio.Task | None = None
+        self.dropped = 0
+        self.explicit_zones: set[str] = set()  # from "subscribe" messages
+        self.position_zones: set[str] = set()  # derived from "position" messages
+        self.zoned = False  # has subscribed or reported a position
+
+    @property
+    def zones(self) -> set[str]:
+        return self.explicit_zones | self.position_zones
+
+    def enqueue(self, text: str) -> bool:
+        """Queue a payload; False if the slow-consumer policy says disconnect."""
+        if len(self.queue) >= WS_QUEUE_SIZE:
+            self.dropped += 1
+            if WS_SLOW_POLICY == "disconnect":
+                return False
+            metrics.incr("ws.dropped")
+            if WS_SLOW_POLICY == "drop_newest":
+                return True
+            self.queue.popleft()
+        self.queue.append(text)
+        self.ready.set()
+        return True
+
 
 class ConnectionManager:
     """Manages active WebSocket connections for real-time alerts."""
 
-    def __init__(self):
-        # session_id → WebSocket
-        self.active_connections: dict[str, WebSocket] = {}
-        # In-memory alert log (most recent 100)
-        self.alert_log: list[dict] = []
+    def __init__(self, alert_log: AlertLog | None = None):
+        # session_id → connection (socket + send queue + writer task)
+        self.connections: dict[str, _Connection] = {}
+        # zone → session_ids subscribed to it (explicitly or by position)
+        self.zone_index: dict[str, set[str]] = {}
+        # sessions with no zone information yet
+        self.unzoned: set[str] = set()
+        # Last reported position per session, and sessions without one
+        self.positions = PositionIndex()
+        self.unlocated: set[str] = set()
+        # Ring buffer of recent alerts (optionally journaled to disk)
+        self.alert_log = alert_log if alert_log is not None else AlertLog()
+        # Cross-worker transport; replaced by start_pubsub() at startup
+        self.broker = LocalBroker()
+        # fn(session_id, lat, lng) per position update / fn(session_id) on close
+        self._position_listeners: list = []
+        self._disconnect_listeners: list = []
+        # Background close() calls for sockets dropped by the manager
+        self._closing: set[asyncio.Task] = set()
+
+    async def start_pubsub(self, broker=None):
+        """Join the configured pub/sub backend so other workers' alerts reach us."""
+        self.broker = broker or create_broker()
+        await self.broker.start(self._on_remote)
+
+    async def stop_pubsub(self):
+        await self.broker.close()
+
+    def add_position_listener(self, fn):
+        self._position_listeners.append(fn)
+
+    def add_disconnect_listener(self, fn):
+        self._disconnect_listeners.append(fn)
 
     async def connect(self, session_id: str, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections[session_id] = websocket
-        print(
-            f"[WS] Driver connected: {session_id} (total: {len(self.active_connections)})"
-        )
+        previous = self.connections.get(session_id)
+        if previous is not None:
+            # Same driver reconnected: retire the old socket
+            self._drop(previous)
+            self._close_socket(previous.websocket, 1000, "replaced by a new connection")
+        conn = _Connection(session_id, websocket)
+        conn.writer = asyncio.create_task(self._writer(conn))
+        self.connections[session_id] = conn
+        self.unzoned.add(session_id)
+        self.unlocated.add(session_id)
+        print(f"[WS] Driver connected: {session_id} (total: {len(self.connections)})")
 
-    def disconnect(self, session_id: str):
-        self.active_connections.pop(session_id, None)
+    def disconnect(self, session_id: str, websocket: WebSocket | None = None):
+        conn = self.connections.get(session_id)
+        if conn is None or (websocket is not None and conn.websocket is not websocket):
+            return  # already replaced by a newer connection for this session
+        self._drop(conn)
         print(
-            f"[WS] Driver disconnected: {session_id} (total: {len(self.active_connections)})"
+            f"[WS] Driver disconnected: {session_id} (total: {len(self.connections)})"
         )
 
-    async def send_to_driver(self, session_id: str, alert: dict):
-        """Send alert to a specific driver."""
-        ws = self.active_connections.get(session_id)
-        if ws:
-            try:
-                await ws.send_json(alert)
-            except Exception:
-                self.disconnect(session_id)
+    def _drop(self, conn: _Connection):
+        if self.connections.get(conn.session_id) is conn:
+            del self.connections[conn.session_id]
+            self._reindex(conn, set())
+            self.unzoned.discard(conn.session_id)
+            self.unlocated.discard(conn.session_id)
+            self.positions.remove(conn.session_id)
+            for fn in self._disconnect_listeners:
+                fn(conn.session_id)
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    async def _writer(self, conn: _Connection):
+        ws = conn.websocket
+        try:
+            while True:
+                await conn.ready.wait()
+                conn.ready.clear()
+                while conn.queue:
+                    text = conn.queue.popleft()
+                    async with asyncio.timeout(WS_SEND_TIMEOUT):
+                        await ws.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or stalled past WS_SEND_TIMEOUT — drop the client
+            metrics.incr("ws.send_failed")
+            self.disconnect(conn.session_id, ws)
+            self._close_socket(ws, 1011)
+
+    def _evict(self, conn: _Connection):
+        """Close a consumer that can't keep up (WS_SLOW_POLICY=disconnect)."""
+        metrics.incr("ws.evicted")
+        self._drop(conn)
+        self._close_socket(conn.websocket, 1013)  # "try again later"
 
-    async def broadcast(self, alert: dict):
-        """Send alert to ALL connected drivers."""
-        self._log_alert(alert)
-        disconnected = []
-        for sid, ws in self.active_connections.items():
+    def _close_socket(self, websocket: WebSocket, code: int, reason: str = ""):
+        """Close a socket the manager no longer tracks (in the background)."""
+
+        async def _close():
             try:
-                await ws.send_json(alert)
+                await websocket.close(code=code, reason=reason or None)
             except Exception:
-                disconnected.append(sid)
-        for sid in disconnected:
-            self.disconnect(sid)
+                pass  # already closed or the transport is gone
+
+        task = asyncio.create_task(_close())
+        self._closing.add(task)  # keep a reference until it finishes
+        task.add_done_callback(self._closing.discard)
+
+    def _deliver(self, text: str, connections) -> int:
+        delivered = 0
+        slow = []
+        for conn in connections:
+            if conn.enqueue(text):
+                delivered += 1
+            else:
+                slow.append(conn)
+        for conn in slow:
+            self._evict(conn)
+        return delivered
+
+    async def send_to_driver(self, session_id: str, alert: dict):
+        """Send alert to a specific driver (on whichever worker holds it)."""
+        if not self.notify(session_id, alert):
+            await self._publish("driver", alert, session_id=session_id)
+
+    def notify(self, session_id: str, alert: dict) -> bool:
+        """Queue alert for one driver (usable from sync code); False if offline."""
+        conn = self.connections.get(session_id)
+        if conn is None:
+            return False
+        return self._deliver(encode_alert(alert), [conn]) == 1
 
-    async def broadcast_zone(self, zone: str, alert: dict):
-        """Broadcast to all drivers (zone filtering done client-side for simplicity)."""
+    async def broadcast(self, alert: dict) -> int:
+        """
+        Send alert to ALL connected drivers (on every worker); returns the
+        number queued on this worker.
+        """
+        # Publish first so other workers fan out in parallel with us
+        await self._publish("all", alert)
+        return self._broadcast_local(alert)
+
+    async def broadcast_zone(self, zone: str, alert: dict) -> int:
+        """
+        Send alert to the drivers in ``zone`` (everyone for "All Zones").
+        Cost scales with the zone's audience, not with total connections.
+        Returns the number queued on this worker.
+        """
         alert["zone"] = zone
-        await self.broadcast(alert)
+        if not zone or zone == ALL_ZONES:
+            return await self.broadcast(alert)
+        await self._publish("zone", alert, zone=zone)
+        return self._zone_local(zone, alert)
+
+    def _broadcast_local(self, alert: dict, relayed: bool = False) -> int:
+        self._log_alert(alert, relayed)
+        started = time.perf_counter()
+        delivered = self._deliver(encode_alert(alert), list(self.connections.values()))
+        metrics.observe("ws.broadcast", time.perf_counter() - started)
+        return delivered
+
+    def _zone_local(self, zone: str, alert: dict, relayed: bool = False) -> int:
+        self._log_alert(alert, relayed)
+        started = time.perf_counter()
+        audience = set(self.zone_index.get(zone, ()))
+        if WS_UNZONED_GET_ZONE_ALERTS:
+            audience |= self.unzoned
+        delivered = self._deliver(
+            encode_alert(alert),
+            [self.connections[sid] for sid in audience if sid in self.connections],
+        )
+        metrics.observe("ws.broadcast_zone", time.perf_counter() - started)
+        return delivered
+
+    async def broadcast_near(
+        self, lat: float, lon: float, radius_km: float, alert: dict
+    ) -> int:
+        """
+        Send alert to drivers whose last position is within ``radius_km``
+        of (lat, lon), on every worker. Returns the number queued here.
+        """
+        await self._publish("near", alert, lat=lat, lon=lon, radius_km=radius_km)
+        return self._near_local(lat, lon, radius_km, alert)
 
-    def _log_alert(self, alert: dict):
-        alert["logged_at"] = datetime.now().isoformat()
-        self.alert_log.append(alert)
-        if len(self.alert_log) > 100:
-            self.alert_log = self.alert_log[-100:]
+    def _near_local(
+        self, lat: float, lon: float, radius_km: float, alert: dict, relayed=False
+    ) -> int:
+        self._log_alert(alert, relayed)
+        started = time.perf_counter()
+        try:
+            nearby = self.positions.within(float(lat), float(lon), float(radius_km))
+        except (TypeError, ValueError):
+            return 0
+        audience = {sid for sid, _ in nearby}
+        if WS_UNLOCATED_GET_NEARBY_ALERTS:
+            audience |= self.unlocated
+        delivered = self._deliver(
+            encode_alert(alert),
+            [self.connections[sid] for sid in audience if sid in self.connections],
+        )
+        metrics.observe("ws.broadcast_near", time.perf_counter() - started)
+        return delivered
+
+    # ------------------------------------------------------------------
+    # Cross-worker fan-out
+    # ------------------------------------------------------------------
+    async def _publish(self, op: str, alert: dict, **target):
+        alert.setdefault("logged_at", datetime.now().isoformat())
+        envelope = {"origin": WORKER_ID, "op": op, "alert": alert, **target}
+        await self.broker.publish(encode_alert(envelope))
+
+    def _on_remote(self, text: str):
+        """Deliver an alert published by another worker to our own sockets."""
+        try:
+            envelope = json.loads(text)
+            if envelope.get("origin") == WORKER_ID:
+                return
+            op, alert = envelope["op"], envelope["alert"]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            metrics.incr("pubsub.malformed")
+            return
+        if op == "all":
+            self._broadcast_local(alert, relayed=True)
+        elif op == "zone":
+            self._zone_local(envelope.get("zone", ""), alert, relayed=True)
+        elif op == "near":
+            self._near_local(
+                envelope.get("lat"),
+                envelope.get("lon"),
+                envelope.get("radius_km"),
+                alert,
+                relayed=True,
+            )
+        elif op == "driver":
+            self.notify(envelope.get("session_id", ""), alert)
+
+    # ------------------------------------------------------------------
+    # Zone subscriptions (client → server messages)
+    # ------------------------------------------------------------------
+    def handle_message(self, session_id: str, text: str):
+        """
+        Process one message from a driver's socket. Understood (JSON):
+            {"type": "subscribe", "zones": ["Kothrud", ...]}
+            {"type": "unsubscribe", "zones": [...]}   (no zones → all)
+            {"type": "position", "lat": 18.5, "lng": 73.8}   ("type" optional)
+        Anything else is ignored. Positions also go to the position
+        listeners (e.g. the hotspot geofence).
+        """
+        conn = self.connections.get(session_id)
+        if conn is None:
+            return
+        try:
+            msg = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(msg, dict):
+            return
+        kind = msg.get("type", "position" if "lat" in msg else None)
+        if kind == "position":
+            try:
+                lat = float(msg["lat"])
+                lng = float(msg.get("lng", msg.get("lon")))
+            except (KeyError, TypeError, ValueError):
+                return
+            if not (math.isfinite(lat) and math.isfinite(lng)):
+                return
+            self.update_position(conn, lat, lng)
+            self.positions.update(session_id, lat, lng)
+            self.unlocated.discard(session_id)
+            for fn in self._position_listeners:
+                fn(session_id, lat, lng)
+        elif kind in ("subscribe", "unsubscribe"):
+            zones = msg.get("zones", [])
+            if isinstance(zones, str):
+                zones = [zones]
+            zones = {str(z).strip() for z in zones if str(z).strip()}
+            if kind == "subscribe":
+                self.subscribe(session_id, zones)
+            else:
+                self.unsubscribe(session_id, zones or None)
+
+    def subscribe(self, session_id: str, zones: set[str]):
+        conn = self.connections.get(session_id)
+        if conn is not None:
+            self._set_zones(conn, explicit=conn.explicit_zones | zones)
+
+    def unsubscribe(self, session_id: str, zones: set[str] | None = None):
+        conn = self.connections.get(session_id)
+        if conn is not None:
+            remaining = set() if zones is None else conn.explicit_zones - zones
+            self._set_zones(conn, explicit=remaining)
+
+    def update_position(self, conn: _Connection, lat: float, lng: float):
+        """Place the driver in the zones around its reported position."""
+        zones = zones_at(lat, lng)
+        if conn.zoned and zones == conn.position_zones:
+            return  # still in the same zones (the common case)
+        self._set_zones(conn, position=zones)
+
+    def _set_zones(self, conn: _Connection, explicit=None, position=None):
+        before = conn.zones
+        if explicit is not None:
+            conn.explicit_zones = explicit
+        if position is not None:
+            conn.position_zones = position
+        if not conn.zoned:
+            conn.zoned = True
+            self.unzoned.discard(conn.session_id)
+        self._reindex(conn, conn.zones, before)
+
+    def _reindex(self, conn: _Connection, after: set[str], before=None):
+        before = conn.zones if before is None else before
+        sid = conn.session_id
+        for zone in before - after:
+            members = self.zone_index.get(zone)
+            if members is not None:
+                members.discard(sid)
+                if not members:
+                    del self.zone_index[zone]
+        for zone in after - before:
+            self.zone_index.setdefault(zone, set()).add(sid)
+
+    def _log_alert(self, alert: dict, relayed: bool = False):
+        # Set by the worker that first sent it; kept by the ones relaying it
+        alert.setdefault("logged_at", datetime.now().isoformat())
+        # Only the originating worker journals, so a shared journal has no dupes
+        self.alert_log.append(alert, journal=not relayed)
 
     def get_recent_alerts(self, limit: int = 20) -> list[dict]:
-        return self.alert_log[-limit:]
+        return self.alert_log.recent(limit)
 
     @property
     def connected_count(self) -> int:
-        return len(self.active_connections)
+        return len(self.connections)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "zones": {z: len(sids) for z, sids in sorted(self.zone_index.items())},
+            "unzoned": len(self.unzoned),
+            "unlocated": len(self.unlocated),
+            "positions": self.positions.stats(),
+            "queued": sum(len(c.queue) for c in self.connections.values()),
+            "slow_policy": WS_SLOW_POLICY,
+            "queue_size": WS_QUEUE_SIZE,
+            "alert_log": len(self.alert_log),
+            "alert_seq": self.alert_log.last_seq,
+            "worker": WORKER_ID,
+            "pubsub": self.broker.stats(),
+        }
 
 
 # Singleton instance
 manager = ConnectionManager()
+metrics.register_gauge("ws", manager.stats)
 
 
 def build_alert(
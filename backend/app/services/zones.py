@@ -0,0 +1,54 @@
+"""
+Named broadcast zones (the areas an admin can target from the dashboard).
+
+Each zone is a circle around a locality centre. Drivers are placed in
+zones from their reported position (``zones_at``) or subscribe to them
+explicitly over the alerts socket.
+"""
+
+import math
+import os
+
+ALL_ZONES = "All Zones"
+ZONE_RADIUS_KM = float(os.getenv("ZONE_RADIUS_KM", "3"))
+
+# name → (lat, lng) — keep in sync with ZONES in AdminDashboard.tsx
+ZONES: dict[str, tuple[float, float]] = {
+    "Hinjewadi": (18.5913, 73.7389),
+    "Katraj Bypass": (18.4529, 73.8553),
+    "Sinhagad Road": (18.4800, 73.8200),
+    "Pune Station": (18.5289, 73.8744),
+    "Kothrud": (18.5074, 73.8077),
+    "Hadapsar": (18.5089, 73.9260),
+    "Viman Nagar": (18.5679, 73.9143),
+    "Baner": (18.5590, 73.7868),
+    "Wakad": (18.5987, 73.7652),
+}
+
+_KM_PER_DEG = 111.0
+
+
+def zones_at(lat: float, lng: float, radius_km: float = ZONE_RADIUS_KM) -> set[str]:
+    """Names of the zones whose circle contains (lat, lng)."""
+    inside = set()
+    cos_lat = math.cos(math.radians(lat))
+    r2 = (radius_km / _KM_PER_DEG) ** 2
+    for name, (z_lat, z_lng) in ZONES.items():
+        d_lat = lat - z_lat
+        d_lng = (lng - z_lng) * cos_lat
+        if d_lat * d_lat + d_lng * d_lng <= r2:
+            inside.add(name)
+    return inside
+
+
+def nearest_zone(lat: float, lng: float, max_km: float = 2 * ZONE_RADIUS_KM) -> str:
+    """Closest zone name (for labelling a point), or a coordinate string."""
+    cos_lat = math.cos(math.radians(lat))
+    best, best_d2 = None, (max_km / _KM_PER_DEG) ** 2
+    for name, (z_lat, z_lng) in ZONES.items():
+        d_lat = lat - z_lat
+        d_lng = (lng - z_lng) * cos_lat
+        d2 = d_lat * d_lat + d_lng * d_lng
+        if d2 <= best_d2:
+            best, best_d2 = name, d2
+    return best or f"{lat:.3f}, {lng:.3f}"
@@ -53,6 +53,7 @@ export default function App() {
   const wsSessionId = wsSessionIdRef.current;
   const { connected: wsConnected, alerts: wsAlerts, dismissAlert } = useWebSocket(wsSessionId, {
     enabled: true,
+    position: trackingEnabled ? position : null,
   });
 
   // Auto-fill start with GPS when tracking turns on
@@ -127,6 +127,21 @@ export interface SOSResponse {
   message: string;
 }
 
+export interface SOSListParams {
+  status?: 'active' | 'acknowledged' | 'resolved';
+  since?: string;
+  until?: string;
+  /** next_cursor from the previous page */
+  cursor?: string;
+  limit?: number;
+}
+
+export interface SOSListResponse {
+  events: Record<string, unknown>[];
+  /** Pass as `cursor` for the next (older) page; null on the last page */
+  next_cursor: string | null;
+}
+
 // ── Admin Broadcast Types ─────────────────────────────────────────────────────
 
 export interface BroadcastRequest {
@@ -185,7 +200,7 @@ export const safetyApi = {
   getAlertLog: () =>
     apiClient.get('/api/admin/alerts'),
 
-  /** GET /api/sos/list — SOS events for admin */
-  getSOSList: () =>
-    apiClient.get('/api/sos/list'),
+  /** GET /api/sos/list — SOS events for admin, newest first, one page at a time */
+  getSOSList: (params: SOSListParams = {}) =>
+    apiClient.get<SOSListResponse>('/api/sos/list', { params }),
 };
\ No newline at end of file
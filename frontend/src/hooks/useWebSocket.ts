@@ -4,15 +4,29 @@ import type { WSAlert } from '../api/client';
 interface UseWebSocketOptions {
   enabled: boolean;
   maxAlerts?: number;
+  /** Latest GPS fix; reported to the server so zone and SOS alerts can be targeted */
+  position?: { lat: number; lng: number } | null;
 }
 
+// Minimum gap between position reports (the server only needs the zone / area)
+const POSITION_REPORT_MS = 5000;
+
 export function useWebSocket(sessionId: string, options: UseWebSocketOptions) {
-  const { enabled, maxAlerts = 10 } = options;
+  const { enabled, maxAlerts = 10, position = null } = options;
   const [connected, setConnected] = useState(false);
   const [alerts, setAlerts] = useState<WSAlert[]>([]);
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout> | undefined>(undefined);
   const reconnectAttempts = useRef(0);
+  const positionRef = useRef(position);
+  const lastReportRef = useRef(0);
+
+  const reportPosition = useCallback((ws: WebSocket) => {
+    const pos = positionRef.current;
+    if (!pos || ws.readyState !== WebSocket.OPEN) return;
+    ws.send(JSON.stringify({ type: 'position', lat: pos.lat, lng: pos.lng }));
+    lastReportRef.current = Date.now();
+  }, []);
 
   // Store connect in a ref so the onclose callback always has the latest version
   const connectRef = useRef<() => void>(() => {});
@@ -30,6 +44,7 @@ export function useWebSocket(sessionId: string, options: UseWebSocketOptions) {
         setConnected(true);
         reconnectAttempts.current = 0;
         console.log('[WS] Connected to alerts');
+        reportPosition(ws);
       };
 
       ws.onmessage = (event) => {
@@ -64,7 +79,7 @@ export function useWebSocket(sessionId: string, options: UseWebSocketOptions) {
     } catch {
       // WebSocket not available
     }
-  }, [enabled, sessionId, maxAlerts]);
+  }, [enabled, sessionId, maxAlerts, reportPosition]);
 
   // Keep the ref in sync with the latest connect function
   useEffect(() => {
@@ -82,6 +97,16 @@ export function useWebSocket(sessionId: string, options: UseWebSocketOptions) {
     };
   }, [enabled, connect]);
 
+  // Report position changes (throttled) on the open socket
+  useEffect(() => {
+    positionRef.current = position;
+    const ws = wsRef.current;
+    if (ws && Date.now() - lastReportRef.current >= POSITION_REPORT_MS) {
+      reportPosition(ws);
+    }
+  // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [position?.lat, position?.lng, reportPosition]);
+
   const dismissAlert = useCallback((index: number) => {
     setAlerts(prev => prev.filter((_, i) => i !== index));
   }, []);